@@ -0,0 +1,61 @@
+# benchmarks/bench_serialization.py
+# Compares the ORM read path (Todo objects + to_dict() + jsonify) with the Core fast path that
+# GET /todos uses (plain rows + orjson when installed), on a scratch database.
+#
+#   python benchmarks/bench_serialization.py                 # 1k, 10k and 100k rows
+#   python benchmarks/bench_serialization.py --sizes 1000 --repeat 10
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+# Point the server at a scratch database before importing it
+os.environ['TODO_DATABASE_URI'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import jsonify
+import server
+from server import app, db, init_db, Todo, TODO_LIST_ORDER
+from seeding import seed
+
+def orm_path():
+    todos = Todo.query.order_by(*TODO_LIST_ORDER).all()
+    return jsonify([todo.to_dict() for todo in todos]).get_data()
+
+def fast_path():
+    return server.dumps(server.fetch_todo_dicts(server.todo_rows_select().order_by(*TODO_LIST_ORDER)))
+
+def fast_path_stdlib_json():
+    orjson, server.orjson = server.orjson, None
+    try:
+        return fast_path()
+    finally:
+        server.orjson = orjson
+
+# Best of `repeat` runs in milliseconds; the session is reset so no identity map is reused
+def best_time(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        db.session.remove()
+        start = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - start) * 1000)
+    return min(timings)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark list serialization paths")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with app.app_context():
+        init_db()
+        print(f"orjson installed: {server.orjson is not None}")
+        print(f"{'rows':>8} {'ORM + jsonify':>15} {'Core + stdlib':>15} {'Core + orjson':>15} {'speedup':>8}")
+        for size in sorted(args.sizes):
+            seed(size)
+            orm_ms = best_time(orm_path, args.repeat)
+            stdlib_ms = best_time(fast_path_stdlib_json, args.repeat)
+            fast_ms = best_time(fast_path, args.repeat)
+            print(f"{size:>8} {orm_ms:>12.1f} ms {stdlib_ms:>12.1f} ms {fast_ms:>12.1f} ms {orm_ms / fast_ms:>7.1f}x")
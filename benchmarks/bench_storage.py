@@ -0,0 +1,73 @@
+# benchmarks/bench_storage.py
+# Compares the storage backends (TODO_STORAGE=sqlite, memory, log) on what the overlay does most:
+# adding a todo, toggling one and reading a page, one request at a time through the Flask test
+# client. Each backend runs in its own process on a scratch directory, since the backend is picked
+# when server.py is imported. Commit is the time spent in the database commit alone.
+#
+#   python benchmarks/bench_storage.py
+#   python benchmarks/bench_storage.py --todos 5000 --backends sqlite log
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKENDS = ('sqlite', 'memory', 'log')
+PAGE_SIZE = 100 # Same page size as the desktop client
+
+# Runs in the child process, with TODO_STORAGE already set
+def measure(count):
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import server
+    from server import app, init_db
+
+    with app.app_context():
+        init_db()
+    client = app.test_client()
+
+    def per_request(start):
+        return (time.perf_counter() - start) / count * 1000
+
+    start = time.perf_counter()
+    todo_ids = [client.post('/todos', json={'content': f"Benchmark todo {i}"}).json['id'] for i in range(count)]
+    create_ms = per_request(start)
+    start = time.perf_counter()
+    for todo_id in todo_ids:
+        client.put(f"/todos/{todo_id}", json={'is_completed': True})
+    toggle_ms = per_request(start)
+    start = time.perf_counter()
+    for _ in range(count):
+        client.get('/todos', query_string={'limit': PAGE_SIZE}, headers={'Cache-Control': 'no-cache'})
+    list_ms = per_request(start)
+
+    commits = list(server.commit_duration.series.values())
+    commit_ms = sum(values[-2] for values in commits) / sum(values[-1] for values in commits) * 1000
+    return {'create_ms': create_ms, 'toggle_ms': toggle_ms, 'list_ms': list_ms, 'commit_ms': commit_ms}
+
+def run_backend(backend, count):
+    directory = tempfile.mkdtemp()
+    environment = dict(os.environ, TODO_STORAGE=backend, TODO_ARCHIVE_INTERVAL='0',
+                       TODO_DATABASE_URI='sqlite:///' + os.path.join(directory, 'bench.db'),
+                       TODO_LOG_PATH=os.path.join(directory, 'bench.log'))
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', str(count)], env=environment,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the storage backends")
+    parser.add_argument('--todos', type=int, default=1000, help="Todos created and toggled per backend")
+    parser.add_argument('--backends', nargs='+', choices=BACKENDS, default=list(BACKENDS))
+    parser.add_argument('--child', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(args.child)))
+        sys.exit(0)
+
+    print(f"{'backend':>8} {'create':>10} {'toggle':>10} {'list page':>10} {'commit':>10}")
+    for backend in args.backends:
+        result = run_backend(backend, args.todos)
+        print(f"{backend:>8} {result['create_ms']:>7.2f} ms {result['toggle_ms']:>7.2f} ms "
+              f"{result['list_ms']:>7.2f} ms {result['commit_ms']:>7.3f} ms")
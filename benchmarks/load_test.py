@@ -0,0 +1,302 @@
+# benchmarks/load_test.py
+# Load test for server.py: seeds a scratch database to each size, starts the server on it in
+# production mode (waitress) and drives the list, create, update, move, reorder and delete
+# endpoints with concurrent clients. Reports p50/p95/p99 latency and throughput per scenario,
+# writes them as JSON with --output, and with --compare exits 1 if a result regressed.
+#
+#   python benchmarks/load_test.py                                    # 1k, 10k and 100k todos
+#   python benchmarks/load_test.py --sizes 1000 10000 100000 1000000 --concurrency 1 8 32
+#   python benchmarks/load_test.py --scenarios list_page reorder --duration 20 --output after.json
+#   python benchmarks/load_test.py --compare before.json --tolerance 0.25
+#
+# The load generator runs on the same machine as the server, so on few cores it competes with it
+# for CPU; compare results from the same machine only.
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+# Point the server at a scratch database before importing it
+DATABASE_DIR = tempfile.mkdtemp()
+os.environ['TODO_DATABASE_URI'] = 'sqlite:///' + os.path.join(DATABASE_DIR, 'load.db')
+
+from seeding import seed
+import server
+from server import app, db, init_db, Todo
+
+SERVER_SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'server.py')
+PAGE_SIZE = 100 # Same page size as the desktop client
+CURSOR_SAMPLE_SIZE = 1000 # Distinct page starting points for the list_page scenario
+NO_CACHE = {'Cache-Control': 'no-cache'} # Makes the server build the response instead of serving it from its cache
+
+# Raised by TodoIds.take once a scenario has removed every todo
+class PoolEmpty(Exception):
+    pass
+
+# Todo ids the scenarios work on; created todos are added, deleted ones are taken out
+class TodoIds:
+    def __init__(self, ids):
+        self.ids = ids
+        self.lock = threading.Lock()
+
+    def pick(self):
+        return random.choice(self.ids)
+
+    def sample(self, count):
+        return random.sample(self.ids, min(count, len(self.ids)))
+
+    def add(self, todo_id):
+        with self.lock:
+            self.ids.append(todo_id)
+
+    def take(self):
+        with self.lock:
+            if not self.ids:
+                raise PoolEmpty()
+            return self.ids.pop(random.randrange(len(self.ids)))
+
+# --- Scenarios ---
+# Each one sends a single request and returns the response
+
+def list_page(http, url, ids, cursors, options):
+    return http.get(f"{url}/todos", params={'limit': PAGE_SIZE, 'cursor': random.choice(cursors)}, headers=NO_CACHE)
+
+def list_full(http, url, ids, cursors, options):
+    return http.get(f"{url}/todos", headers=NO_CACHE)
+
+def list_cached(http, url, ids, cursors, options):
+    return http.get(f"{url}/todos", params={'limit': PAGE_SIZE})
+
+def create(http, url, ids, cursors, options):
+    response = http.post(f"{url}/todos", json={'content': f"Load test todo {random.random()}"})
+    if response.status_code == 201:
+        ids.add(response.json()['id'])
+    return response
+
+def update(http, url, ids, cursors, options):
+    return http.put(f"{url}/todos/{ids.pick()}", json={'content': f"Updated {random.random()}",
+                                                        'priority': random.randint(0, 3)})
+
+def move(http, url, ids, cursors, options):
+    todo_id, anchor_id = ids.sample(2)
+    return http.put(f"{url}/todos/{todo_id}/move", json={'before_id': anchor_id})
+
+def reorder(http, url, ids, cursors, options):
+    return http.put(f"{url}/todos/reorder", json={'ordered_ids': ids.sample(options.reorder_size)})
+
+def delete(http, url, ids, cursors, options):
+    return http.delete(f"{url}/todos/{ids.take()}")
+
+# In run order; delete comes last so the other scenarios don't hit removed ids
+SCENARIOS = {
+    'list_page': list_page,
+    'list_full': list_full,
+    'list_cached': list_cached,
+    'create': create,
+    'update': update,
+    'move': move,
+    'reorder': reorder,
+    'delete': delete,
+}
+
+# --- Load Generator ---
+
+# Run one scenario with `concurrency` closed-loop clients for `duration` seconds
+def run_scenario(name, concurrency, duration, url, ids, cursors, options):
+    scenario = SCENARIOS[name]
+    latencies = [[] for _ in range(concurrency)]
+    errors = [0] * concurrency
+    start = time.perf_counter()
+    deadline = start + duration
+
+    def client(index):
+        http = requests.Session()
+        while time.perf_counter() < deadline:
+            request_start = time.perf_counter()
+            try:
+                response = scenario(http, url, ids, cursors, options)
+                failed = response.status_code >= 400
+            except requests.exceptions.RequestException:
+                failed = True
+            except PoolEmpty:
+                break # Nothing left to delete; this client stops early
+            latencies[index].append((time.perf_counter() - request_start) * 1000)
+            errors[index] += failed
+        http.close()
+
+    clients = [threading.Thread(target=client, args=(index,)) for index in range(concurrency)]
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return summarize([latency for client_latencies in latencies for latency in client_latencies], sum(errors), elapsed)
+
+def summarize(latencies, errors, elapsed):
+    latencies.sort()
+    if len(latencies) > 1:
+        cuts = statistics.quantiles(latencies, n=100, method='inclusive')
+        p50, p95, p99 = cuts[49], cuts[94], cuts[98]
+    elif latencies:
+        p50 = p95 = p99 = latencies[0]
+    else:
+        p50 = p95 = p99 = 0.0 # No request completed (e.g. the pool was already empty)
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'duration_s': round(elapsed, 3),
+        'throughput_rps': round(len(latencies) / elapsed, 1),
+        'latency_ms': {
+            'p50': round(p50, 2), 'p95': round(p95, 2), 'p99': round(p99, 2),
+            'mean': round(statistics.fmean(latencies or [0.0]), 2), 'max': round(max(latencies, default=0.0), 2)
+        }
+    }
+
+# --- Server Process ---
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def start_server(port, threads, log):
+    process = subprocess.Popen(
+        [sys.executable, SERVER_SCRIPT, '--production', '--host', '127.0.0.1', '--port', str(port), '--threads', str(threads)],
+        stdout=log, stderr=subprocess.STDOUT
+    )
+    url = f"http://127.0.0.1:{port}"
+    for _ in range(300):
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode}, see {log.name}")
+        try:
+            requests.get(f"{url}/todos/active", timeout=1)
+            return process, url
+        except requests.exceptions.ConnectionError:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError("Server did not start within 30 seconds")
+
+def stop_server(process):
+    process.terminate()
+    try:
+        process.wait(10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+# Seed to `size` and collect the ids and a sample of page cursors to work on
+def prepare_database(size):
+    with app.app_context():
+        seed(size)
+        ids = [todo_id for (todo_id,) in db.session.query(Todo.id)]
+        sample = server.todo_rows_select().order_by(db.func.random()).limit(CURSOR_SAMPLE_SIZE)
+        cursors = [server.encode_cursor(todo) for todo in server.fetch_todo_dicts(sample)]
+        db.session.remove()
+        db.engine.dispose() # The server process opens its own connections
+    random.shuffle(ids)
+    return TodoIds(ids), cursors
+
+# --- Reporting ---
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=os.path.dirname(SERVER_SCRIPT),
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def print_result(result):
+    latency = result['latency_ms']
+    print(f"{result['size']:>8} {result['scenario']:>12} {result['concurrency']:>4} {result['requests']:>7} "
+          f"{result['errors']:>6} {result['throughput_rps']:>9.1f} {latency['p50']:>9.1f} {latency['p95']:>9.1f} "
+          f"{latency['p99']:>9.1f}", flush=True)
+
+# Results whose p95 latency or throughput got worse than the baseline by more than `tolerance`
+def find_regressions(results, baseline, tolerance):
+    baseline_results = {(r['size'], r['scenario'], r['concurrency']): r for r in baseline['results']}
+    regressions = []
+    for result in results:
+        before = baseline_results.get((result['size'], result['scenario'], result['concurrency']))
+        if before is None:
+            continue
+        if result['latency_ms']['p95'] > before['latency_ms']['p95'] * (1 + tolerance):
+            regressions.append(f"{result['scenario']} size={result['size']} c={result['concurrency']}: "
+                               f"p95 {before['latency_ms']['p95']} -> {result['latency_ms']['p95']} ms")
+        if result['throughput_rps'] < before['throughput_rps'] * (1 - tolerance):
+            regressions.append(f"{result['scenario']} size={result['size']} c={result['concurrency']}: "
+                               f"throughput {before['throughput_rps']} -> {result['throughput_rps']} req/s")
+    return regressions
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Load test the todo server endpoints")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000],
+                        help="Todo counts to seed, run in increasing order (e.g. 1000000)")
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32], help="Concurrent clients per run")
+    parser.add_argument('--scenarios', nargs='+', choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument('--duration', type=float, default=10, help="Seconds per scenario and concurrency level")
+    parser.add_argument('--threads', type=int, default=16, help="Server worker threads")
+    parser.add_argument('--reorder-size', type=int, default=100, help="Todos sent per reorder request")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed for the request mix")
+    parser.add_argument('--output', help="Write the results as JSON to this file")
+    parser.add_argument('--compare', help="Baseline JSON from an earlier --output run")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="Allowed relative slowdown before --compare fails")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    started_at = datetime.datetime.now().isoformat(timespec='seconds')
+    with app.app_context():
+        init_db()
+        db.engine.dispose()
+
+    scenarios = [name for name in SCENARIOS if name in args.scenarios]
+    results = []
+    print(f"Database: {os.environ['TODO_DATABASE_URI']}")
+    print(f"{'size':>8} {'scenario':>12} {'conc':>4} {'reqs':>7} {'errors':>6} {'req/s':>9} "
+          f"{'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    with open(os.path.join(DATABASE_DIR, 'server.log'), 'w') as log:
+        for size in sorted(args.sizes):
+            ids, cursors = prepare_database(size)
+            process, url = start_server(free_port(), args.threads, log)
+            try:
+                for name in scenarios:
+                    for concurrency in args.concurrency:
+                        result = {'size': size, 'scenario': name, 'concurrency': concurrency}
+                        result.update(run_scenario(name, concurrency, args.duration, url, ids, cursors, args))
+                        results.append(result)
+                        print_result(result)
+            finally:
+                stop_server(process)
+
+    report = {
+        'started_at': started_at,
+        'git_revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'orjson': server.orjson is not None,
+        'options': {'duration': args.duration, 'threads': args.threads, 'reorder_size': args.reorder_size, 'seed': args.seed},
+        'results': results
+    }
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(report, output, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            regressions = find_regressions(results, json.load(baseline_file), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print("No regressions against the baseline.")
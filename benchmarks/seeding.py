@@ -0,0 +1,31 @@
+# benchmarks/seeding.py
+# Shared by the benchmarks: fills the todos table of the server's configured database with
+# synthetic rows. Set TODO_DATABASE_URI before importing this module (it imports server).
+import datetime
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import server
+from server import db, Todo
+
+SEED_BATCH_SIZE = 10000
+
+# Grow the todos table to `count` rows with bulk inserts (needs an app context)
+def seed(count):
+    existing = db.session.query(db.func.count(Todo.id)).scalar()
+    now = datetime.datetime.now()
+    for start in range(existing, count, SEED_BATCH_SIZE):
+        db.session.execute(db.insert(Todo), [
+            {
+                'content': f"Benchmark todo {i}",
+                'is_completed': i % 3 == 0,
+                'created_at': now + datetime.timedelta(microseconds=i),
+                'due_date': now + datetime.timedelta(days=i % 30) if i % 2 else None,
+                'priority': i % 4,
+                'position': (i + 1) * server.POSITION_GAP
+            }
+            for i in range(start, min(start + SEED_BATCH_SIZE, count))
+        ])
+        db.session.commit()
@@ -2,14 +2,130 @@
 import tkinter as tk
 from tkinter import font, messagebox
 import requests
+import datetime
 import json
+import queue
+import random
 import threading
 import time
+import uuid
 
 # --- Configuration ---
 # Backend server address
 # Please replace '127.0.0.1' with your computer's local network IP address, e.g., '192.168.101.6'
 API_BASE_URL = "http://192.168.101.6:5000" # <-- **Please confirm this is your actual local IP**
+PAGE_SIZE = 100 # Todos fetched per page; further pages load as the list is scrolled
+EVENT_STREAM_RETRY_MAX = 30 # Upper bound (seconds) of the reconnect backoff for the live change stream
+SEARCH_DEBOUNCE_MS = 300 # Pause in typing before the search box queries the server
+# Ask for todo lists in the server's columnar form (field names sent once, not per row); plain JSON
+# still works with older servers. requests already asks for gzip/deflate and decompresses transparently.
+COLUMNS_MIMETYPE = "application/vnd.todos.columns+json"
+LIST_HEADERS = {'Accept': f"{COLUMNS_MIMETYPE}, application/json;q=0.5"}
+# Changes are sent with an Idempotency-Key, so a request that times out can safely be retried
+MUTATION_TIMEOUT = (3, 5) # Connect and read timeouts (seconds) of one attempt
+MUTATION_RETRIES = 3 # Extra attempts after a timeout or lost connection
+READ_TIMEOUT = (3, 10) # Connect and read timeouts (seconds) of list, search and sync requests
+READ_RETRIES = 2 # Extra attempts of a read after a timeout or lost connection
+RETRY_BACKOFF = 0.5 # Base delay (seconds) before a retry; doubles per attempt, with random jitter
+RETRY_BACKOFF_MAX = 4 # Upper bound (seconds) of the delay before a retry
+NETWORK_THREADS = 4 # Worker threads sending requests, so Tk never waits on the network
+ROW_HEIGHT = 34 # Height (pixels) of one row in the todo list, including the gap to the next row
+STATUS_MESSAGE_MS = 4000 # How long a notice (e.g. a change the server refused) stays above the list
+
+# --- API Client ---
+# All requests share one pooled session, so connections to the server are kept alive and reused
+# instead of set up again for every request.
+class TodoApi:
+    def __init__(self):
+        self.session = requests.Session()
+        # One connection per network worker, plus the live change stream
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=NETWORK_THREADS + 1)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def request(self, method, path, retries=READ_RETRIES, timeout=READ_TIMEOUT, **kwargs):
+        # Timeouts and lost connections are retried up to `retries` times, so only pass retries
+        # for requests that are safe to repeat: reads, and changes sent with an Idempotency-Key
+        for attempt in range(retries + 1):
+            start = time.perf_counter()
+            try:
+                response = self.session.request(method, f"{API_BASE_URL}{path}", timeout=timeout, **kwargs)
+            except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                if attempt == retries:
+                    print(f"{method} {path} failed after {elapsed_ms:.0f} ms ({e.__class__.__name__}).") # Debug print
+                    raise
+                print(f"{method} {path} failed after {elapsed_ms:.0f} ms ({e.__class__.__name__}), retrying.") # Debug print
+                self.wait_before_retry(attempt)
+                continue
+            print(f"{method} {path} -> {response.status_code} in {(time.perf_counter() - start) * 1000:.0f} ms") # Debug print
+            return response
+
+    def wait_before_retry(self, attempt):
+        # Jittered exponential backoff, so clients that lost the server together don't retry in step
+        delay = min(RETRY_BACKOFF * 2 ** attempt, RETRY_BACKOFF_MAX)
+        time.sleep(random.uniform(delay / 2, delay))
+
+    def get(self, path, **kwargs):
+        return self.request('GET', path, **kwargs)
+
+    def send(self, method, path, **kwargs):
+        # Every attempt carries the same key: the server applies the change once and answers retries
+        # with the original response
+        headers = dict(kwargs.pop('headers', {}), **{'Idempotency-Key': str(uuid.uuid4())})
+        for attempt in range(MUTATION_RETRIES + 1):
+            response = self.request(method, path, retries=MUTATION_RETRIES, timeout=MUTATION_TIMEOUT,
+                                    headers=headers, **kwargs)
+            if response.status_code == 409 and 'Retry-After' in response.headers and attempt < MUTATION_RETRIES:
+                time.sleep(int(response.headers['Retry-After'])) # The first attempt is still running
+                continue
+            return response
+
+# --- Network Worker ---
+# Runs requests on background threads and hands each result to a callback on the Tk thread.
+# Jobs submitted under the same key replace each other: a newer load makes an older one stale,
+# so a stale job still in the queue is skipped and a stale result is dropped.
+class NetworkWorker:
+    def __init__(self, master, threads=NETWORK_THREADS):
+        self.master = master
+        self.jobs = queue.Queue()
+        self.generations = {} # key -> number of the newest job submitted under it
+        self.lock = threading.Lock()
+        for _ in range(threads):
+            threading.Thread(target=self.run, daemon=True).start()
+
+    def submit(self, call, on_done=None, on_error=None, key=None):
+        # call() runs on a worker thread; on_done(result) or on_error(exception) on the Tk thread
+        self.jobs.put((call, on_done, on_error, key, self.cancel(key)))
+
+    def cancel(self, key):
+        # Makes every job submitted under `key` so far stale
+        if key is None:
+            return None
+        with self.lock:
+            generation = self.generations[key] = self.generations.get(key, 0) + 1
+        return generation
+
+    def is_current(self, key, generation):
+        return key is None or self.generations.get(key) == generation
+
+    def run(self):
+        while True:
+            call, on_done, on_error, key, generation = self.jobs.get()
+            if not self.is_current(key, generation):
+                continue
+            try:
+                result = call()
+            except Exception as e:
+                callback, value = on_error, e
+            else:
+                callback, value = on_done, result
+            if callback:
+                self.master.after(0, self.finish, callback, value, key, generation)
+
+    def finish(self, callback, value, key, generation):
+        if self.is_current(key, generation): # Checked again now that we are back on the Tk thread
+            callback(value)
 
 # --- Tkinter Application Class ---
 class TodoApp:
@@ -102,21 +218,38 @@ class TodoApp:
                                          activebackground=self.button_active_bg_color, activeforeground=self.text_color_dark, bd=0, padx=8, pady=4)
         self.add_button.pack(side="right")
 
+        # Removes every completed todo in one request
+        self.clear_button = tk.Button(self.input_frame, text="Clear done", command=self.clear_completed,
+                                      bg=self.button_bg_color, fg=self.text_color_dark, relief="flat", font=self.font_todo,
+                                      activebackground=self.button_active_bg_color, activeforeground=self.text_color_dark, bd=0, padx=8, pady=4)
+        self.clear_button.pack(side="right", padx=(0, 5))
+
+        # Search box: filters the list below as you type
+        self.search_frame = tk.Frame(self.todo_list_frame, bg=self.bg_color_medium)
+        self.search_frame.pack(fill="x", padx=5)
+
+        self.search_label = tk.Label(self.search_frame, text="Search", bg=self.bg_color_medium, fg=self.text_color_gray, font=self.font_todo)
+        self.search_label.pack(side="left", padx=(0, 5))
+
+        self.search_input = tk.Entry(self.search_frame, bg=self.bg_color_dark, fg=self.text_color_dark, insertbackground=self.text_color_dark,
+                                     font=self.font_todo, relief="flat", bd=2, highlightbackground=self.button_bg_color, highlightthickness=1)
+        self.search_input.pack(side="left", fill="x", expand=True)
+        self.search_input.bind("<KeyRelease>", self.on_search_key)
+        self.search_query = "" # Active search; while set, the list shows search results
+        self.search_after_id = None # Pending debounced search
+        self.search_results = [] # Server answer to search_query
+
+        # Notices about failed changes, shown above the list for a few seconds instead of a dialog
+        self.status_label = tk.Label(self.todo_list_frame, text="", bg=self.bg_color_medium, fg="red", font=("Inter", 9), anchor="w")
+        self.status_after_id = None
+
         # Todo list display area (using Canvas and Scrollbar for scrollable list)
+        # The list is virtualized: its scroll region is as tall as all rows, but only rows in view get widgets
         self.todo_canvas = tk.Canvas(self.todo_list_frame, bg=self.bg_color_medium, highlightthickness=0)
         self.scrollbar = tk.Scrollbar(self.todo_list_frame, orient="vertical", command=self.todo_canvas.yview,
                                       troughcolor=self.bg_color_dark, bg=self.button_bg_color, activebackground=self.button_active_bg_color)
-        self.scrollable_frame = tk.Frame(self.todo_canvas, bg=self.bg_color_medium)
-
-        self.scrollable_frame.bind(
-            "<Configure>",
-            lambda e: self.todo_canvas.configure(
-                scrollregion=self.todo_canvas.bbox("all")
-            )
-        )
-
-        self.todo_canvas.create_window((0, 0), window=self.scrollable_frame, anchor="nw")
-        self.todo_canvas.configure(yscrollcommand=self.scrollbar.set)
+        self.todo_canvas.configure(yscrollcommand=self.on_todo_canvas_scroll)
+        self.todo_canvas.bind("<Configure>", lambda e: self.render_visible_rows()) # More or wider rows on resize
 
         self.todo_canvas.pack(side="left", fill="both", expand=True, padx=5, pady=5)
         self.scrollbar.pack(side="right", fill="y")
@@ -132,8 +265,22 @@ class TodoApp:
             fill=self.insertion_indicator_color, width=5, state='hidden', arrow="last" # Hidden initially, increased width, added arrow
         )
         
-        self.todo_frames = [] # List to keep track of todo item frames and their data
+        self.row_pool = [] # Row widgets, re-bound to whichever todos are in view
+        self.row_width = None # Width the pooled rows were last laid out with
+        self.active_label_todo = None # (id, content) the collapsed label shows, () for "No todos yet"
+        self.todo_frames = [] # The pooled rows currently showing a todo, top to bottom
+        self.displayed_todos = [] # Todos the list shows (the synced list or search results)
         self.current_todos_data = [] # Stores the current order of todo data (dictionaries)
+        self.pending_rows = {} # Todo id -> row as it looks once pending changes are saved (None = deleted)
+        self.change_queues = {} # Todo id -> {'version', 'requests'}: changes to that todo still to be confirmed
+        self.next_temp_id = -1 # Ids of added todos the server hasn't confirmed yet are negative
+        self.todos_version = None # Server change-log version of current_todos_data (None = full reload needed)
+        self.todos_etag = None # ETag of the last list response, sent back as If-None-Match
+        self.active_todo_etag = None # ETag of the last /todos/active response (collapsed mode)
+        self.next_cursor = None # Server cursor for the next page (None = everything is loaded)
+        self.page_boundary = None # Sort key of the last loaded todo; rows after it belong to unloaded pages
+        self.is_loading_page = False # Prevents requesting the same page twice while scrolling
+        self.event_stream_connected = False # While True, the 60s polling sync is skipped
 
         # Window drag properties
         self._offset_x = None # Mouse X position relative to the widget when pressed
@@ -146,8 +293,13 @@ class TodoApp:
         # Bind resize event to redraw rounded rectangle
         self.master.bind("<Configure>", self.on_window_configure)
 
-        # Initial load of todos and start periodic sync
+        # Every request goes through the network worker and the shared session; results come back via master.after
+        self.api = TodoApi()
+        self.network = NetworkWorker(master)
+
+        # Initial load of todos, live change stream, and periodic sync as a fallback
         self.load_todos()
+        self.start_event_listener()
         self.schedule_sync()
 
     def on_window_configure(self, event):
@@ -262,97 +414,456 @@ class TodoApp:
             self.bg_canvas.itemconfigure(self.main_frame_window, state='hidden')
             self.bg_canvas.itemconfigure(self.todo_list_frame_window, state='normal')
             # self.todo_list_frame.pack(fill="both", expand=True) # No need to pack, handled by create_window
-            self.load_todos() # Refresh todo list on expand to ensure latest data
             print("Window expanded.") # Debug print
         self.is_expanded = not self.is_expanded
+        if self.is_expanded:
+            self.load_todos() # Refresh todo list on expand to ensure latest data (skipped while collapsed)
         self.on_window_configure(None) # Redraw rounded corners for new size
 
     # --- Load Todo Items ---
     def load_todos(self):
-        try:
-            response = requests.get(f"{API_BASE_URL}/todos")
-            response.raise_for_status()
-            todos = response.json()
-            self.current_todos_data = todos # Update the internal list of todo data
-            self.update_todo_display(todos)
-            print("Todos loaded successfully.") # Debug print
-        except requests.exceptions.ConnectionError:
-            self.label_current_todo.config(text="Cannot connect to server", fg="red")
-            self.circle_label.pack_forget() # Hide circle if no connection
+        if not self.is_expanded:
+            # The collapsed overlay only shows the active todo; the full list syncs when the panel opens
+            self.load_active_todo()
+            return
+
+        # Only fetch what changed since the last sync once we have a full copy. The request runs on
+        # the network worker, so it gets the version and ETag as they are now instead of reading them
+        since, etag = self.todos_version, self.todos_etag
+        if since is None:
+            call = self.fetch_all_todos
+        else:
+            call = lambda: self.fetch_todo_changes(since, etag)
+        # A newer load supersedes one still in flight
+        self.network.submit(call, self.on_todos_loaded, self.on_load_error, key='todos')
+
+    def on_todos_loaded(self, result):
+        if result is None:
+            print("Todos unchanged, skipping redraw.") # Debug print
+            return
+        kind, response, data = result
+        if kind == 'all':
+            self.todos_version = int(response.headers.get('X-Todos-Version', 0))
+            # Pages requested for the old copy don't fit the new one
+            self.network.cancel('page')
+            self.is_loading_page = False
+            self.set_next_page(response, data)
+            todos = data
+        else:
+            todos = self.apply_changes(data)
+        self.todos_etag = response.headers.get('ETag')
+        self.current_todos_data = todos # Update the internal list of todo data
+        self.show_todos()
+        print("Todos loaded successfully.") # Debug print
+
+    def on_load_error(self, error):
+        if isinstance(error, requests.exceptions.ConnectionError):
+            self.show_load_error("Cannot connect to server")
             print("Error: Could not connect to the backend server. Please ensure it is running.")
-        except requests.exceptions.HTTPError as e:
-            self.label_current_todo.config(text="Load failed", fg="red")
-            self.circle_label.pack_forget() # Hide circle if load failed
-            print(f"HTTP Error loading todos: {e}")
-        except Exception as e:
-            self.label_current_todo.config(text="Load failed", fg="red")
-            self.circle_label.pack_forget() # Hide circle if load failed
-            print(f"Error loading todos: {e}")
+        elif isinstance(error, requests.exceptions.HTTPError):
+            self.show_load_error("Load failed")
+            print(f"HTTP Error loading todos: {error}")
+        else:
+            self.show_load_error("Load failed")
+            print(f"Error loading todos: {error}")
+
+    def show_load_error(self, text):
+        self.label_current_todo.config(text=text, fg="red")
+        self.circle_label.pack_forget() # Hide circle if load failed
+        self.active_label_todo = None # The label no longer shows a todo, so the next one must be drawn
+        # Forget the ETags so the next successful sync redraws instead of getting a 304
+        self.todos_etag = None
+        self.active_todo_etag = None
+
+    def load_active_todo(self):
+        headers = {'If-None-Match': self.active_todo_etag} if self.active_todo_etag else {}
+        self.network.submit(lambda: self.fetch_active_todo(headers), self.on_active_todo_loaded,
+                            self.on_load_error, key='active')
+
+    def fetch_active_todo(self, headers):
+        # Runs on the network worker
+        response = self.api.get("/todos/active", headers=headers)
+        if response.status_code == 304:
+            return None
+        response.raise_for_status()
+        return response
+
+    def on_active_todo_loaded(self, response):
+        if response is None:
+            print("Active todo unchanged.") # Debug print
+            return
+        self.active_todo_etag = response.headers.get('ETag')
+        self.update_active_todo_label(response.json())
+
+    # The fetch_* methods run on the network worker: they only send requests and parse the answers,
+    # the on_*_loaded callbacks then update our state on the Tk thread
+    def fetch_all_todos(self):
+        # Start over from the first page; later pages are fetched by load_more_todos
+        response = self.api.get("/todos", params={'limit': PAGE_SIZE}, headers=LIST_HEADERS)
+        response.raise_for_status()
+        return 'all', response, self.read_todo_list(response)
+
+    def read_todo_list(self, response):
+        data = response.json()
+        if response.headers.get('Content-Type', '').startswith(COLUMNS_MIMETYPE):
+            # {"id": [...], "content": [...], ...} back to one dict per todo
+            return [dict(zip(data, values)) for values in zip(*data.values())]
+        return data
+
+    def set_next_page(self, response, todos):
+        self.next_cursor = response.headers.get('X-Next-Cursor')
+        if self.next_cursor and todos:
+            self.page_boundary = (todos[-1]['position'], todos[-1]['created_at'], todos[-1]['id'])
+        else:
+            self.page_boundary = None
 
-    # --- Update Todo Item Display ---
-    def update_todo_display(self, todos):
-        # Clear old todo display
-        for widget in self.scrollable_frame.winfo_children():
-            widget.destroy()
-        self.todo_frames.clear() # Clear the list of todo frames
+    def is_beyond_loaded_pages(self, todo):
+        # True if the todo sorts after the last loaded one, i.e. it belongs to a page not fetched yet
+        if self.page_boundary is None:
+            return False
+        position, created_at, todo_id = self.page_boundary
+        if todo['position'] != position:
+            return todo['position'] > position
+        if todo['created_at'] != created_at:
+            return todo['created_at'] < created_at
+        return todo['id'] < todo_id
+
+    # --- Lazy Paging ---
+    def on_todo_canvas_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        self.render_visible_rows() # The view moved: show the rows now inside it
+        # Fetch the next page once the user scrolls near the bottom of what is loaded
+        if float(last) > 0.9 and self.next_cursor and not self.is_loading_page and not self.search_query:
+            self.is_loading_page = True
+            self.master.after_idle(self.load_more_todos)
+
+    def load_more_todos(self):
+        cursor = self.next_cursor
+        self.network.submit(lambda: self.fetch_page(cursor), self.on_page_loaded, self.on_page_error, key='page')
+
+    def fetch_page(self, cursor):
+        response = self.api.get("/todos", params={'limit': PAGE_SIZE, 'cursor': cursor}, headers=LIST_HEADERS)
+        response.raise_for_status()
+        return response, self.read_todo_list(response)
+
+    def on_page_loaded(self, result):
+        response, page = result
+        self.is_loading_page = False
+        # A page read at a newer version than ours may overlap rows we already hold
+        known_ids = {todo['id'] for todo in page}
+        todos = [todo for todo in self.current_todos_data if todo['id'] not in known_ids] + page
+        self.set_next_page(response, page)
+        self.current_todos_data = self.sort_todos(todos)
+        self.show_todos()
+        print(f"Loaded {len(page)} more todos.") # Debug print
+
+    def on_page_error(self, error):
+        self.is_loading_page = False
+        print(f"Error loading more todos: {error}")
+
+    def fetch_todo_changes(self, since, etag):
+        headers = {'If-None-Match': etag} if etag else {}
+        response = self.api.get("/todos/changes", params={'since': since}, headers=headers)
+        if response.status_code == 304:
+            return None # Server version still matches ours
+        if response.status_code == 410:
+            # Our version fell out of the server's change log, start over with a full load
+            print("Change log expired, reloading all todos.") # Debug print
+            return self.fetch_all_todos()
+        response.raise_for_status()
+        return 'changes', response, response.json()
+
+    def apply_changes(self, changes):
+        # Apply the delta: drop deleted ids, replace or add changed rows
+        todos_by_id = {todo['id']: todo for todo in self.current_todos_data}
+        for todo_id in changes['deleted']:
+            todos_by_id.pop(todo_id, None)
+        for todo in changes['todos']:
+            todos_by_id[todo['id']] = todo
+        # Keep only rows inside the loaded pages; the rest arrive with their page
+        todos = [todo for todo in todos_by_id.values() if not self.is_beyond_loaded_pages(todo)]
+        self.todos_version = changes['version']
+        print(f"Applied {len(changes['todos'])} changed and {len(changes['deleted'])} deleted todos.") # Debug print
+        return self.sort_todos(todos)
+
+    def sort_todos(self, todos):
+        # Same order as the server: position ascending, then newest first (higher id first on ties)
+        todos.sort(key=lambda todo: (todo['created_at'], todo['id']), reverse=True)
+        todos.sort(key=lambda todo: todo['position'])
+        return todos
+
+    # --- Search ---
+    def on_search_key(self, event=None):
+        # Debounce: only query once typing pauses
+        if self.search_after_id:
+            self.master.after_cancel(self.search_after_id)
+        self.search_after_id = self.master.after(SEARCH_DEBOUNCE_MS, self.run_search)
+
+    def run_search(self):
+        self.search_after_id = None
+        query = self.search_input.get().strip()
+        self.search_query = query
+        if not query:
+            self.network.cancel('search') # Drop the answer to a search still in flight
+            self.redraw_todos()
+            return
+        # A newer query makes the answer to this one stale, so results the user has typed past never show
+        self.network.submit(lambda: self.fetch_search(query), lambda todos: self.on_search_loaded(query, todos),
+                            lambda e: print(f"Error searching todos: {e}"), key='search')
+
+    def fetch_search(self, query):
+        response = self.api.get("/todos/search", params={'q': query, 'limit': PAGE_SIZE}, headers=LIST_HEADERS)
+        response.raise_for_status()
+        return self.read_todo_list(response)
+
+    def on_search_loaded(self, query, todos):
+        if query == self.search_query:
+            self.search_results = todos
+            self.redraw_todos()
+            print(f"Search '{query}' found {len(todos)} todos.") # Debug print
+
+    # Show the synced list, or refresh the search results while a search is active
+    def show_todos(self):
+        if self.search_query:
+            self.run_search()
+        else:
+            self.redraw_todos()
 
-        # Filter incomplete todos for the floating window
-        incomplete_todos = [todo for todo in todos if not todo['is_completed']]
+    # Redraw from what we hold, pending changes included, without asking the server
+    def redraw_todos(self):
+        if self.search_query:
+            self.update_todo_display(self.with_pending(self.search_results, add_created=False))
+        else:
+            self.update_todo_display(self.with_pending(self.current_todos_data))
 
-        if incomplete_todos:
-            self.label_current_todo.config(text=incomplete_todos[0]['content'], fg=self.text_color_dark)
+    # --- Update Todo Item Display ---
+    def update_active_todo_label(self, active_todo):
+        # Syncs mostly bring the same active todo again; only touch the label when it changes
+        shown = (active_todo['id'], active_todo['content']) if active_todo else ()
+        if shown == self.active_label_todo:
+            return
+        self.active_label_todo = shown
+        if active_todo:
+            self.label_current_todo.config(text=active_todo['content'], fg=self.text_color_dark)
             self.circle_label.pack(side="left", padx=(0, 5)) # Show circle next to active todo
-            print(f"Active todo set: {incomplete_todos[0]['content']}") # Debug print
+            print(f"Active todo set: {active_todo['content']}") # Debug print
         else:
             self.label_current_todo.config(text="No todos yet", fg=self.text_color_gray)
             self.circle_label.pack_forget() # Hide circle if no todos
             print("No active todo.") # Debug print
 
-        # Display all todos in the expanded list
-        for todo in todos:
-            frame = tk.Frame(self.scrollable_frame, bg=self.original_bg_color, bd=1, relief="solid", highlightbackground=self.highlight_bg_color, highlightthickness=1)
-            frame.pack(fill="x", pady=2, padx=5)
-
-            # Store todo data directly on the frame for drag-and-drop
-            frame.todo_data = todo
-
-            # Bind drag and drop events to the todo item frame
-            frame.bind("<ButtonPress-1>", self.on_todo_item_press)
-            frame.bind("<B1-Motion>", self.on_todo_item_drag)
-            frame.bind("<ButtonRelease-1>", self.on_todo_item_release)
-            frame.bind("<Enter>", self.on_todo_item_enter) # For drop target highlighting
-            frame.bind("<Leave>", self.on_todo_item_leave) # For drop target un-highlighting
-
-            check_var = tk.BooleanVar(value=todo['is_completed'])
-            checkbox = tk.Checkbutton(frame, variable=check_var,
-                                      command=lambda t=todo, v=check_var: self.toggle_complete(t, v),
-                                      bg=self.original_bg_color, fg=self.text_color_dark, selectcolor=self.button_bg_color,
-                                      activebackground=self.original_bg_color, bd=0, relief="flat")
-            checkbox.pack(side="left", padx=(0, 5))
-
-            label = tk.Label(frame, text=todo['content'], bg=self.original_bg_color, fg=self.text_color_dark, font=self.font_todo, anchor="w", wraplength=220) # Added wraplength
-            label.pack(side="left", fill="x", expand=True)
-            # Bind drag events to label as well, so dragging on text works
-            label.bind("<ButtonPress-1>", self.on_todo_item_press)
-            label.bind("<B1-Motion>", self.on_todo_item_drag)
-            label.bind("<ButtonRelease-1>", self.on_todo_item_release)
-            label.bind("<Enter>", self.on_todo_item_enter)
-            label.bind("<Leave>", self.on_todo_item_leave)
-
-
-            if todo['is_completed']:
-                label.config(fg=self.text_color_gray)
-
-            delete_button = tk.Button(frame, text="X", command=lambda t=todo: self.delete_todo(t),
-                                       bg="#FF6666", fg="white", relief="flat", font=("Inter", 10, "bold"), # Red delete button
-                                       activebackground="#FF3333", activeforeground="white", bd=0, padx=6, pady=2)
-            delete_button.pack(side="right")
+    def update_todo_display(self, todos):
+        # First incomplete todo for the floating window (from the list, also while showing search results)
+        listed_todos = self.with_pending(self.current_todos_data) if self.search_query else todos
+        self.update_active_todo_label(next((todo for todo in listed_todos if not todo['is_completed']), None))
+
+        if todos == self.displayed_todos:
+            return # A sync that brought nothing new: leave every row as it is
+        if len(todos) != len(self.displayed_todos):
+            # Only the scroll region depends on the number of todos; widgets exist for the visible rows only
+            self.todo_canvas.config(scrollregion=(0, 0, self.todo_canvas.winfo_width(), len(todos) * ROW_HEIGHT))
+        self.displayed_todos = todos
+        self.render_visible_rows()
+
+    # --- Virtualized Todo Rows ---
+    def render_visible_rows(self):
+        # Reconcile the pooled rows with the todos inside the viewport, keyed on todo id: a todo that
+        # is already on screen keeps its row, and a row is only moved or reconfigured if its position,
+        # text or completed state changed. Rows that scrolled out are re-bound to the todos that
+        # scrolled in. Runs on every change, scroll and resize, and never costs more than the viewport.
+        first_index = max(int(self.todo_canvas.canvasy(0) // ROW_HEIGHT), 0)
+        visible_count = self.todo_canvas.winfo_height() // ROW_HEIGHT + 2 # Partly visible rows at both edges
+        visible_todos = self.displayed_todos[first_index:first_index + visible_count]
+        while len(self.row_pool) < len(visible_todos):
+            self.row_pool.append(self.create_row())
+
+        row_width = max(self.todo_canvas.winfo_width() - 10, 1)
+        if row_width != self.row_width:
+            self.row_width = row_width
+            for row in self.row_pool:
+                self.todo_canvas.itemconfigure(row.window_id, width=row_width)
+
+        visible_ids = {todo['id'] for todo in visible_todos}
+        rows_by_id = {row.todo_data['id']: row for row in self.row_pool if row.index is not None}
+        free_rows = [row for row in self.row_pool if row.index is None or row.todo_data['id'] not in visible_ids]
+
+        self.todo_frames = []
+        for offset, todo in enumerate(visible_todos):
+            row = rows_by_id.get(todo['id']) or free_rows.pop()
+            self.bind_row(row, todo)
+            self.place_row(row, first_index + offset)
+            self.todo_frames.append(row)
+        for row in free_rows:
+            self.place_row(row, None)
+
+    def create_row(self):
+        # One row of the list: frame, checkbox, label and delete button, created once and reused for
+        # any todo. The callbacks read the todo the row shows at the time of the click.
+        frame = tk.Frame(self.todo_canvas, bg=self.original_bg_color, bd=1, relief="solid", highlightbackground=self.highlight_bg_color, highlightthickness=1)
+        frame.todo_data = None
+        frame.shown = None # (content, is_completed) the widgets currently display
+        frame.index = None # List index the row is placed at, None while hidden
+
+        frame.check_var = tk.BooleanVar()
+        frame.checkbox = tk.Checkbutton(frame, variable=frame.check_var,
+                                        command=lambda: self.toggle_complete(frame.todo_data, frame.check_var),
+                                        bg=self.original_bg_color, fg=self.text_color_dark, selectcolor=self.button_bg_color,
+                                        activebackground=self.original_bg_color, bd=0, relief="flat")
+        frame.checkbox.pack(side="left", padx=(0, 5))
+
+        # Rows have a fixed height, so long content is cut off instead of wrapped
+        frame.label = tk.Label(frame, bg=self.original_bg_color, fg=self.text_color_dark, font=self.font_todo, anchor="w")
+        frame.label.pack(side="left", fill="x", expand=True)
+
+        frame.delete_button = tk.Button(frame, text="X", command=lambda: self.delete_todo(frame.todo_data),
+                                        bg="#FF6666", fg="white", relief="flat", font=("Inter", 10, "bold"), # Red delete button
+                                        activebackground="#FF3333", activeforeground="white", bd=0, padx=6, pady=2)
+        frame.delete_button.pack(side="right")
+
+        # Drag and drop on the frame and on the label, so dragging on text works
+        for widget in (frame, frame.label):
+            widget.bind("<ButtonPress-1>", self.on_todo_item_press)
+            widget.bind("<B1-Motion>", self.on_todo_item_drag)
+            widget.bind("<ButtonRelease-1>", self.on_todo_item_release)
+            widget.bind("<Enter>", self.on_todo_item_enter) # For drop target highlighting
+            widget.bind("<Leave>", self.on_todo_item_leave) # For drop target un-highlighting
+
+        frame.window_id = self.todo_canvas.create_window(0, 0, anchor="nw", window=frame, state='hidden',
+                                                         width=self.row_width or 1, height=ROW_HEIGHT - 4)
+        return frame
+
+    def bind_row(self, row, todo):
+        # Store todo data directly on the frame for drag-and-drop and the row's buttons. The dict is
+        # always replaced (it carries the version for the next write), the widgets only if needed.
+        row.todo_data = todo
+        shown = (todo['content'], todo['is_completed'])
+        if shown != row.shown:
+            row.shown = shown
+            row.check_var.set(todo['is_completed'])
+            row.label.config(text=todo['content'], fg=self.text_color_gray if todo['is_completed'] else self.text_color_dark)
+
+    def place_row(self, row, index):
+        # Move the row to list position `index`, or hide it for None
+        if index == row.index:
+            return
+        if index is None:
+            self.todo_canvas.itemconfigure(row.window_id, state='hidden')
+        else:
+            self.todo_canvas.coords(row.window_id, 5, index * ROW_HEIGHT + 2)
+            if row.index is None:
+                self.todo_canvas.itemconfigure(row.window_id, state='normal')
+        row.index = index
+
+    # --- Sending Changes ---
+    def submit_mutation(self, method, path, on_done, on_error, **kwargs):
+        # Sends the change (with its retries) on the network worker. on_done gets the response,
+        # on_error the exception; an error status other than a version conflict counts as an error
+        def call():
+            response = self.api.send(method, path, **kwargs)
+            if response.status_code == 409 and 'todo' in response.json():
+                return response # Version conflict, see on_change_done
+            response.raise_for_status()
+            return response
+        self.network.submit(call, on_done, on_error)
+
+    def show_request_error(self, error, action):
+        if isinstance(error, requests.exceptions.ConnectionError):
+            self.show_status(f"Couldn't {action}: cannot connect to server.")
+        elif isinstance(error, requests.exceptions.HTTPError):
+            self.show_status(f"Couldn't {action}: {error}")
+        else:
+            self.show_status(f"Couldn't {action}: unknown error ({error})")
+        print(f"Failed to {action}: {error}")
+
+    def show_status(self, text):
+        self.status_label.config(text=text)
+        self.status_label.pack(fill="x", padx=5, before=self.todo_canvas)
+        if self.status_after_id:
+            self.master.after_cancel(self.status_after_id)
+        self.status_after_id = self.master.after(STATUS_MESSAGE_MS, self.hide_status)
+
+    def hide_status(self):
+        self.status_after_id = None
+        self.status_label.pack_forget()
+
+    def apply_todo_rows(self, todos=(), deleted_ids=()):
+        # Put what a write returned into our copy instead of syncing again. The change log still
+        # holds these changes, so the next sync from our version fetches them once more; that's harmless.
+        replaced_ids = set(deleted_ids) | {todo['id'] for todo in todos}
+        kept = [known for known in self.current_todos_data if known['id'] not in replaced_ids]
+        self.current_todos_data = self.sort_todos(kept + list(todos))
+
+    # --- Optimistic Changes ---
+    # A change shows up at once: the row as it will look afterwards goes into pending_rows, which
+    # overlays the synced copy until the server answers. Changes to one todo are sent one at a time,
+    # each with the version the previous one produced, so quick clicks on the same todo don't
+    # conflict with each other. If the server refuses a change, that todo's overlay is dropped and
+    # its synced row shows again; the rest of the list is left alone.
+    def with_pending(self, todos, add_created=True):
+        if not self.pending_rows:
+            return todos
+        merged = [self.pending_rows.get(todo['id'], todo) for todo in todos]
+        merged = [todo for todo in merged if todo is not None]
+        if not add_created:
+            return merged # Search results keep the server's ranking
+        # Todos added here but not confirmed yet, or dropped from our copy by a sync meanwhile
+        known_ids = {todo['id'] for todo in todos}
+        merged += [row for todo_id, row in self.pending_rows.items() if row is not None and todo_id not in known_ids]
+        return self.sort_todos(merged)
+
+    def change_todo(self, todo, pending_row, request, action, on_confirmed=None):
+        # request(version) returns (method, path, kwargs) for the todo at `version`, the one the
+        # previous change left (or the one we saw when nothing is in flight)
+        pending = self.change_queues.setdefault(todo['id'], {'version': todo.get('version'), 'requests': []})
+        pending['requests'].append((request, action, on_confirmed))
+        self.pending_rows[todo['id']] = pending_row
+        if len(pending['requests']) == 1:
+            self.send_next_change(todo['id'])
+        self.redraw_todos()
+
+    def send_next_change(self, todo_id):
+        pending = self.change_queues[todo_id]
+        request, action, on_confirmed = pending['requests'][0]
+        method, path, kwargs = request(pending['version'])
+        self.submit_mutation(method, path, lambda response: self.on_change_done(todo_id, response),
+                             lambda error: self.on_change_failed(todo_id, error, action), **kwargs)
+
+    def on_change_done(self, todo_id, response):
+        if response.status_code == 409:
+            # Another device changed the todo first; the response holds its current state (None if deleted)
+            todo = response.json()['todo']
+            print(f"Version conflict, server copy: {todo}") # Debug print
+            self.drop_pending(todo_id)
+            self.apply_todo_rows([todo] if todo else [], [] if todo else [todo_id])
+            self.show_status("This todo was changed on another device. Showing its current state.")
+            self.redraw_todos()
+            return
+
+        pending = self.change_queues[todo_id]
+        request, action, on_confirmed = pending['requests'].pop(0)
+        todo = None if response.status_code == 204 else response.json()
+        if todo is None:
+            self.apply_todo_rows(deleted_ids=[todo_id])
+        else:
+            self.apply_todo_rows([todo])
+            pending['version'] = todo['version']
+        if pending['requests']:
+            self.send_next_change(todo_id)
+        else:
+            self.drop_pending(todo_id)
+        if on_confirmed:
+            on_confirmed(todo)
+        self.redraw_todos()
 
-            # Store the frame and its associated todo data
-            self.todo_frames.append(frame)
+    def on_change_failed(self, todo_id, error, action):
+        # Changes queued behind the failed one built on it, so they are dropped as well
+        self.drop_pending(todo_id)
+        self.show_request_error(error, action)
+        self.redraw_todos()
 
-        self.scrollable_frame.update_idletasks()
-        self.todo_canvas.config(scrollregion=self.todo_canvas.bbox("all"))
+    def drop_pending(self, todo_id):
+        self.change_queues.pop(todo_id, None)
+        self.pending_rows.pop(todo_id, None)
 
     # --- Add Todo Item ---
     def add_todo_event(self, event=None):
@@ -361,53 +872,102 @@ class TodoApp:
     def add_todo(self):
         content = self.todo_input.get().strip()
         if content:
-            try:
-                response = requests.post(f"{API_BASE_URL}/todos", json={'content': content})
-                response.raise_for_status()
-                self.todo_input.delete(0, tk.END)
-                self.load_todos()
-                print(f"Todo added: {content}") # Debug print
-            except requests.exceptions.ConnectionError:
-                messagebox.showerror("Error", "Cannot connect to server, please check network or server status.")
-            except requests.exceptions.HTTPError as e:
-                messagebox.showerror("Error", f"Failed to add todo: {e}")
-            except Exception as e:
-                messagebox.showerror("Error", f"Unknown error adding todo: {e}")
+            # Pasting several lines adds one todo per line in a single batch request
+            lines = [line.strip() for line in content.splitlines() if line.strip()]
+            if len(lines) > 1:
+                operations = [{'op': 'create', 'content': line} for line in lines]
+                path, payload = "/todos/batch", {'operations': operations}
+            else:
+                path, payload = "/todos", {'content': content}
+
+            # Show the new todos at the end of the list right away, under temporary ids
+            position = max((todo['position'] for todo in self.with_pending(self.current_todos_data)), default=0)
+            created_at = datetime.datetime.now().isoformat()
+            created = []
+            for offset, line in enumerate(lines, 1):
+                created.append({'id': self.next_temp_id, 'content': line, 'is_completed': False, 'created_at': created_at,
+                                'due_date': None, 'priority': 0, 'position': position + offset, 'version': None})
+                self.next_temp_id -= 1
+            for row in created:
+                self.pending_rows[row['id']] = row
+            self.todo_input.delete(0, tk.END)
+            self.redraw_todos()
+
+            self.submit_mutation('POST', path, lambda response: self.on_todo_added(created, response),
+                                 lambda e: self.on_add_failed(created, content, e), json=payload)
         else:
             messagebox.showwarning("Warning", "Todo content cannot be empty.")
 
+    def on_todo_added(self, created, response):
+        for row in created:
+            self.pending_rows.pop(row['id'], None)
+        data = response.json()
+        todos = [result['todo'] for result in data['results']] if 'results' in data else [data]
+        self.apply_todo_rows(todos)
+        self.redraw_todos()
+        print(f"Todo added: {[todo['content'] for todo in todos]}") # Debug print
+
+    def on_add_failed(self, created, content, error):
+        for row in created:
+            self.pending_rows.pop(row['id'], None)
+        if not self.todo_input.get().strip():
+            self.todo_input.insert(0, content) # Give the text back so it can be sent again
+        self.show_request_error(error, "add todo")
+        self.redraw_todos()
+
     # --- Toggle Todo Complete Status ---
     def toggle_complete(self, todo, var):
+        if todo['id'] < 0:
+            var.set(todo['is_completed']) # Not saved yet, nothing to change on the server
+            return
         is_completed = var.get()
-        try:
-            response = requests.put(f"{API_BASE_URL}/todos/{todo['id']}", json={'is_completed': is_completed})
-            response.raise_for_status()
-            self.load_todos()
-            print(f"Todo {todo['id']} completion status toggled to {is_completed}") # Debug print
-        except requests.exceptions.ConnectionError:
-            messagebox.showerror("Error", "Cannot connect to server, please check network or server status.")
-            var.set(not is_completed)
-        except requests.exceptions.HTTPError as e:
-            messagebox.showerror("Error", f"Failed to update todo: {e}")
-            var.set(not is_completed)
-        except Exception as e:
-            messagebox.showerror("Error", f"Unknown error updating todo: {e}")
-            var.set(not is_completed)
+        self.change_todo(todo, dict(todo, is_completed=is_completed),
+                         lambda version: ('PUT', f"/todos/{todo['id']}", {'json': {'is_completed': is_completed, 'version': version}}),
+                         "update todo")
+        print(f"Todo {todo['id']} completion status toggled to {is_completed}") # Debug print
 
     # --- Delete Todo Item ---
     def delete_todo(self, todo):
+        if todo['id'] < 0:
+            return # Not saved yet
         if messagebox.askyesno("Delete Confirmation", f"Are you sure you want to delete todo: '{todo['content']}'?"):
-            try:
-                response = requests.delete(f"{API_BASE_URL}/todos/{todo['id']}")
-                response.raise_for_status()
-                self.load_todos()
-                print(f"Todo {todo['id']} deleted.") # Debug print
-            except requests.exceptions.ConnectionError:
-                messagebox.showerror("Error", "Cannot connect to server, please check network or server status.")
-            except requests.exceptions.HTTPError as e:
-                messagebox.showerror("Error", f"Failed to delete todo: {e}")
-            except Exception as e:
-                messagebox.showerror("Error", f"Unknown error deleting todo: {e}")
+            self.change_todo(todo, None,
+                             lambda version: ('DELETE', f"/todos/{todo['id']}",
+                                              {'headers': {'If-Match': f'"{version}"'} if version is not None else {}}),
+                             "delete todo")
+            print(f"Todo {todo['id']} deleted.") # Debug print
+
+    # --- Clear Completed Todos ---
+    def clear_completed(self):
+        todos = self.with_pending(self.current_todos_data)
+        if self.next_cursor is None and not any(todo['is_completed'] for todo in todos):
+            return # Everything is loaded and nothing is completed
+        if messagebox.askyesno("Clear Confirmation", "Delete all completed todos?"):
+            # Hide the completed todos we hold; todos with their own change in flight are left to it
+            cleared_ids = [todo['id'] for todo in todos
+                           if todo['is_completed'] and todo['id'] > 0 and todo['id'] not in self.change_queues]
+            for todo_id in cleared_ids:
+                self.pending_rows[todo_id] = None
+            self.redraw_todos()
+            self.submit_mutation('DELETE', "/todos/completed", lambda response: self.on_completed_cleared(cleared_ids, response),
+                                 lambda e: self.on_clear_failed(cleared_ids, e))
+
+    def on_completed_cleared(self, cleared_ids, response):
+        deleted_ids = response.json()['deleted']
+        self.release_cleared(cleared_ids)
+        self.apply_todo_rows(deleted_ids=deleted_ids)
+        self.redraw_todos()
+        print(f"Cleared completed todos: {deleted_ids}") # Debug print
+
+    def on_clear_failed(self, cleared_ids, error):
+        self.release_cleared(cleared_ids)
+        self.show_request_error(error, "clear completed todos")
+        self.redraw_todos()
+
+    def release_cleared(self, cleared_ids):
+        for todo_id in cleared_ids:
+            if todo_id not in self.change_queues: # A change made since then owns the overlay now
+                self.pending_rows.pop(todo_id, None)
 
     # --- Todo Item Drag and Drop Handlers ---
     def on_todo_item_press(self, event):
@@ -607,7 +1167,7 @@ class TodoApp:
 
             # --- Reordering Logic ---
             # Create a mutable copy of the current todos data
-            new_ordered_todos = [t for t in self.current_todos_data if t['id'] != self.dragged_item_data['id']] # Filter out dragged item
+            new_ordered_todos = [t for t in self.displayed_todos if t['id'] != self.dragged_item_data['id']] # Filter out dragged item
             
             item_to_move = self.dragged_item_data
             
@@ -643,7 +1203,7 @@ class TodoApp:
                         # Fallback if target frame not found (e.g., it was the dragged item itself, or not packed)
                         insert_index = len(new_ordered_todos) 
                 else:
-                    # Fallback if target not found in new_ordered_todos (e.g., dropped on a non-todo widget within scrollable_frame)
+                    # Fallback if target not found in new_ordered_todos (e.g., dropped on a non-todo widget within the list)
                     insert_index = len(new_ordered_todos)
             else:
                 # Dropped on empty space within the scrollable frame, append to end
@@ -652,10 +1212,10 @@ class TodoApp:
             # Insert the dragged item at the determined position
             new_ordered_todos.insert(insert_index, item_to_move)
 
-            # Update the backend with the new order
-            ordered_ids = [todo['id'] for todo in new_ordered_todos]
-            print(f"Sending reorder request with ordered_ids: {ordered_ids}") # Debug print
-            self.reorder_todos_backend(ordered_ids)
+            # Tell the backend only where the item went: next to its new neighbour
+            # (search results are not the list order, so dragging them doesn't reorder)
+            if new_ordered_todos != self.displayed_todos and not self.search_query:
+                self.move_todo_backend(item_to_move, new_ordered_todos, insert_index)
             
             self._reset_drag_state() # Reset drag flags and variables
             return "break" # Crucial: Stop event propagation to the master window
@@ -698,25 +1258,90 @@ class TodoApp:
                     if isinstance(child, (tk.Label, tk.Checkbutton)):
                         child.config(bg=self.original_bg_color)
 
-    # --- Backend Reorder Call ---
-    def reorder_todos_backend(self, ordered_ids):
-        try:
-            response = requests.put(f"{API_BASE_URL}/todos/reorder", json={'ordered_ids': ordered_ids})
-            response.raise_for_status()
-            self.load_todos() # Reload to ensure UI matches backend
-        except requests.exceptions.ConnectionError:
-            messagebox.showerror("Error", "Failed to reorder: Cannot connect to server.")
-        except requests.exceptions.HTTPError as e:
-            messagebox.showerror("Error", "Failed to reorder todos: " + str(e)) # Convert error to string
-        except Exception as e:
-            messagebox.showerror("Error", "Unknown error reordering todos: " + str(e)) # Convert error to string
+    # --- Backend Move Call ---
+    def move_todo_backend(self, todo, ordered_todos, index):
+        # ordered_todos is the list with todo moved to `index`. The server only needs the new neighbour;
+        # our copy shows the todo there at once, with a position between its two new neighbours.
+        previous = ordered_todos[index - 1] if index > 0 else None
+        following = ordered_todos[index + 1] if index + 1 < len(ordered_todos) else None
+        if following is not None:
+            payload = {'before_id': following['id']}
+            position = (previous['position'] + following['position']) / 2 if previous else following['position'] - 1
+        elif previous is not None:
+            payload = {'after_id': previous['id']}
+            position = previous['position'] + 1
+        else:
+            return
+        if todo['id'] < 0 or (following or previous)['id'] < 0:
+            return # Unsaved todos can't be moved or used as anchor yet
+
+        print(f"Sending move request for todo {todo['id']}: {payload}") # Debug print
+        self.change_todo(todo, dict(todo, position=position),
+                         lambda version: ('PUT', f"/todos/{todo['id']}/move", {'json': dict(payload, version=version)}),
+                         "reorder todos", lambda moved: self.check_move(moved, payload))
+
+    def check_move(self, todo, payload):
+        # Usually only the moved row changes. If the server had to renumber the list to make room,
+        # the row doesn't land next to its anchor in our copy; the delta sync brings the new positions.
+        todo_ids = [known['id'] for known in self.current_todos_data]
+        index = todo_ids.index(todo['id'])
+        if 'before_id' in payload:
+            in_place = index + 1 < len(todo_ids) and todo_ids[index + 1] == payload['before_id']
+        else:
+            in_place = index > 0 and todo_ids[index - 1] == payload['after_id']
+        if not in_place:
+            self.load_todos()
+
+    # --- Live Change Stream ---
+    def start_event_listener(self):
+        threading.Thread(target=self.listen_for_changes, daemon=True).start()
+
+    def listen_for_changes(self):
+        # Runs on a background thread: keeps a Server-Sent Events connection open and hands events to Tk
+        retry_delay = 1
+        while True:
+            try:
+                # The read timeout is well above the server's keep-alive interval, so it only fires on dead links
+                with self.api.get("/todos/events", retries=0, stream=True, timeout=(5, 60)) as response:
+                    response.raise_for_status()
+                    self.event_stream_connected = True
+                    retry_delay = 1
+                    print("Connected to change stream.") # Debug print
+                    self.master.after(0, self.load_todos) # Catch up on anything missed while disconnected
+
+                    event_name, data = None, ''
+                    for line in response.iter_lines(decode_unicode=True):
+                        if line.startswith('event:'):
+                            event_name = line[len('event:'):].strip()
+                        elif line.startswith('data:'):
+                            data += line[len('data:'):].strip()
+                        elif line == '' and event_name:
+                            self.master.after(0, self.on_change_event, event_name, json.loads(data or '{}'))
+                            event_name, data = None, ''
+            except Exception as e:
+                print(f"Change stream disconnected: {e}")
+            self.event_stream_connected = False
+            time.sleep(retry_delay)
+            retry_delay = min(retry_delay * 2, EVENT_STREAM_RETRY_MAX)
+
+    def on_change_event(self, event_name, changes):
+        if event_name == 'changes' and self.is_expanded and changes.get('since') == self.todos_version:
+            # The event continues exactly from our copy: apply it without another request
+            self.current_todos_data = self.apply_changes(changes)
+            self.todos_etag = None # Our copy moved on without a response ETag
+            self.show_todos()
+        else:
+            # Collapsed, reset by the server, or out of step with our copy: a regular (cheap) sync catches up
+            self.load_todos()
 
     # --- Schedule Data Sync ---
     def schedule_sync(self):
-        threading.Timer(60.0, self.sync_data).start()
+        # Runs sync_data on the Tk thread; load_todos hands the request to the network worker
+        self.master.after(60000, self.sync_data)
 
     def sync_data(self):
-        self.load_todos()
+        if not self.event_stream_connected: # The change stream already keeps us up to date
+            self.load_todos()
         self.schedule_sync()
 
 # --- Application Entry Point ---
@@ -1,30 +1,302 @@
 # server.py
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, stream_with_context, g, has_app_context, has_request_context
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.engine import Engine
+from sqlalchemy.engine.interfaces import ExecuteStyle
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.pool import QueuePool
+from collections import OrderedDict
+import argparse
+import base64
 import datetime
+import gzip
+import hashlib
+import json
 import os
+import pickle
+import sqlite3
+import struct
+import threading
+import time
+import zlib
+
+# Optional faster JSON encoder for the read endpoints
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Optional MessagePack encoding of read responses, offered to clients only when installed
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
 
 # Initialize Flask application
 app = Flask(__name__)
 
-# Configure SQLite database
 basedir = os.path.abspath(os.path.dirname(__file__))
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(basedir, 'todos.db')
+
+# Connection pool of a database file, sized for a multi-threaded server; idle event streams give their connection back
+FILE_ENGINE_OPTIONS = {
+    'pool_size': int(os.environ.get('TODO_DB_POOL_SIZE', 10)),
+    'max_overflow': int(os.environ.get('TODO_DB_MAX_OVERFLOW', 20)),
+    'pool_timeout': 30
+}
+
+# --- Storage Backends ---
+# TODO_STORAGE picks where the data lives. Every backend is a SQLite database underneath, so all
+# endpoints run the same queries on each of them:
+#   sqlite  (default) the database file, TODO_DATABASE_URI
+#   memory  an in-memory database, empty at every start (tests and benchmarks)
+#   log     an in-memory database made durable by an append-only journal, TODO_LOG_PATH
+# memory and log keep the data inside the server process, so serve them from a single process
+# (the debug server or --production, not several gunicorn workers).
+
+class SqliteStorage:
+    def __init__(self):
+        # TODO_DATABASE_URI overrides the default file, e.g. for benchmarks
+        self.database_uri = os.environ.get('TODO_DATABASE_URI', 'sqlite:///' + os.path.join(basedir, 'todos.db'))
+        self.engine_options = FILE_ENGINE_OPTIONS
+
+# The connection holding an in-memory database: closing it would drop the data, so the pool can't
+class PersistentConnection(sqlite3.Connection):
+    def close(self):
+        pass
+
+class MemoryStorage:
+    def __init__(self):
+        self.connection = sqlite3.connect(':memory:', check_same_thread=False, factory=PersistentConnection)
+        # Written as a URI: on a plain 'sqlite://' Flask-SQLAlchemy would force a StaticPool, which
+        # lets threads use the connection at the same time, inside each other's transactions
+        self.database_uri = 'sqlite:///file:/todos?mode=memory&uri=true'
+        # A pool of this one connection: requests take turns, one transaction at a time
+        self.engine_options = {'creator': lambda: self.connection, 'poolclass': QueuePool,
+                               'pool_size': 1, 'max_overflow': 0, 'pool_timeout': 30}
+
+    # True for the connection of this backend
+    def owns(self, dbapi_connection):
+        return dbapi_connection is self.connection
+
+# Bound parameters as plain tuples (or dicts) of picklable values, whatever the driver was handed
+def plain_parameters(parameters):
+    if isinstance(parameters, (list, tuple)):
+        return tuple(bytes(value) if isinstance(value, memoryview) else value for value in parameters)
+    return {name: bytes(value) if isinstance(value, memoryview) else value for name, value in parameters.items()}
+
+# Journal size (bytes) at which the log backend folds it into a new snapshot
+LOG_COMPACT_BYTES = int(os.environ.get('TODO_LOG_COMPACT_BYTES', 16 * 1024 * 1024))
+LOG_HEADER = struct.Struct('<II') # Payload length and CRC-32 of a journal record
+LOGGED_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE', 'CREATE', 'DROP', 'ALTER')
+
+# In-memory database whose commits are appended to a journal and fsynced before they complete,
+# instead of rewriting database pages. A record holds one transaction: its sequence number and
+# its write statements with their parameters (a statement's text only the first time in a journal,
+# its number after that). On start the snapshot is loaded and the journal replayed on top of it;
+# at LOG_COMPACT_BYTES the journal is folded into a new snapshot and started over.
+class LogStorage(MemoryStorage):
+    def __init__(self):
+        super().__init__()
+        self.path = os.environ.get('TODO_LOG_PATH', os.path.join(basedir, 'todos.log'))
+        self.snapshot_path = self.path + '.snapshot'
+        self.pending = [] # Write statements of the open transaction
+        self.statement_ids = {} # Statement text -> number within the current journal
+        self.sequence = 0 # Last committed transaction
+        self.load()
+        self.journal = open(self.path, 'ab')
+        event.listen(Engine, 'before_cursor_execute', self.record_statement)
+        event.listen(Engine, 'commit', self.write_record)
+        event.listen(Engine, 'rollback', self.discard_record)
+        event.listen(Engine, 'begin', self.compact_if_needed)
+
+    def load(self):
+        if os.path.exists(self.snapshot_path):
+            snapshot = sqlite3.connect(self.snapshot_path)
+            snapshot.backup(self.connection)
+            self.sequence = snapshot.execute('PRAGMA user_version').fetchone()[0]
+            snapshot.close()
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb') as journal:
+            data = journal.read()
+        statements = []
+        offset = 0
+        while offset + LOG_HEADER.size <= len(data):
+            length, checksum = LOG_HEADER.unpack_from(data, offset)
+            payload = data[offset + LOG_HEADER.size:offset + LOG_HEADER.size + length]
+            if len(payload) < length or zlib.crc32(payload) != checksum:
+                break # Torn by a crash while it was written, so its transaction never committed
+            sequence, entries = pickle.loads(payload)
+            for statement, parameters, executemany in entries:
+                if isinstance(statement, str):
+                    statements.append(statement)
+                else:
+                    statement = statements[statement]
+                # Records up to the snapshot's sequence are already in it (compaction stopped halfway)
+                if sequence > self.sequence:
+                    (self.connection.executemany if executemany else self.connection.execute)(statement, parameters).fetchall()
+            self.connection.commit()
+            self.sequence = max(self.sequence, sequence)
+            offset += LOG_HEADER.size + length
+        if offset < len(data):
+            with open(self.path, 'r+b') as journal:
+                journal.truncate(offset)
+        self.statement_ids = {statement: index for index, statement in enumerate(statements)}
+
+    def record_statement(self, connection, cursor, statement, parameters, context, executemany):
+        if self.owns(cursor.connection) and statement.lstrip()[:7].upper().startswith(LOGGED_STATEMENTS):
+            # insertmanyvalues batches run as a single execute, although flagged executemany
+            executemany = context is not None and context.execute_style is ExecuteStyle.EXECUTEMANY
+            if executemany:
+                parameters = [plain_parameters(row) for row in parameters]
+            else:
+                parameters = plain_parameters(parameters)
+            self.pending.append((statement, parameters, executemany))
+
+    # Runs right before the database commit: the transaction only commits once its record is on disk
+    def write_record(self, connection):
+        if not self.owns(connection.connection.dbapi_connection) or not self.pending:
+            return
+        pending, self.pending = self.pending, []
+        new_ids = {}
+        entries = []
+        for statement, parameters, executemany in pending:
+            statement_id = self.statement_ids.get(statement, new_ids.get(statement))
+            if statement_id is None:
+                new_ids[statement] = len(self.statement_ids) + len(new_ids)
+                statement_id = statement
+            entries.append((statement_id, parameters, executemany))
+        payload = pickle.dumps((self.sequence + 1, entries), pickle.HIGHEST_PROTOCOL)
+        end = self.journal.tell()
+        try:
+            self.journal.write(LOG_HEADER.pack(len(payload), zlib.crc32(payload)) + payload)
+            self.journal.flush()
+            getattr(os, 'fdatasync', os.fsync)(self.journal.fileno()) # fdatasync skips the timestamps (POSIX only)
+        except OSError:
+            self.journal.truncate(end) # Raising rolls the transaction back; don't leave half a record before the next one
+            raise
+        self.statement_ids.update(new_ids)
+        self.sequence += 1
+
+    def discard_record(self, connection):
+        if self.owns(connection.connection.dbapi_connection):
+            self.pending = []
+
+    # Runs when a transaction starts, so the snapshot never contains half of one
+    def compact_if_needed(self, connection):
+        if self.owns(connection.connection.dbapi_connection) and self.journal.tell() > LOG_COMPACT_BYTES:
+            self.compact()
+
+    def compact(self):
+        temporary_path = self.snapshot_path + '.tmp'
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path) # Left over from an interrupted compaction
+        snapshot = sqlite3.connect(temporary_path)
+        self.connection.backup(snapshot)
+        snapshot.execute(f'PRAGMA user_version = {self.sequence}')
+        snapshot.commit()
+        snapshot.close()
+        with open(temporary_path, 'rb') as snapshot_file:
+            os.fsync(snapshot_file.fileno())
+        os.replace(temporary_path, self.snapshot_path)
+        if hasattr(os, 'O_DIRECTORY'): # Make the rename durable too (POSIX only)
+            directory = os.open(os.path.dirname(os.path.abspath(self.snapshot_path)), os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(directory)
+            finally:
+                os.close(directory)
+        # A crash before this point replays the old journal, skipping what the snapshot holds
+        self.journal.close()
+        self.journal = open(self.path, 'wb')
+        self.statement_ids = {}
+        app.logger.info("Compacted the journal into %s at transaction %d.", self.snapshot_path, self.sequence)
+
+STORAGE_BACKENDS = {'sqlite': SqliteStorage, 'memory': MemoryStorage, 'log': LogStorage}
+STORAGE = os.environ.get('TODO_STORAGE', 'sqlite')
+if STORAGE not in STORAGE_BACKENDS:
+    raise SystemExit(f"Unknown TODO_STORAGE {STORAGE!r}, expected one of: {', '.join(STORAGE_BACKENDS)}")
+storage = STORAGE_BACKENDS[STORAGE]()
+
+# Configure the database of the chosen backend
+app.config['SQLALCHEMY_DATABASE_URI'] = storage.database_uri
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = storage.engine_options
+
+# Optional directory for per-list database files (sqlite backend only): lists created while it is set
+# store their todos in their own SQLite file, so writes to different lists don't wait for each other's lock
+LIST_SHARD_DIR = os.environ.get('TODO_LIST_SHARD_DIR') if STORAGE == 'sqlite' else None
+
+# Session that sends the queries of a list stored in its own file to that file (see List Storage).
+# The lists catalog itself always stays in the main database.
+class ListRoutingSession(Session):
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_app_context() and g.get('list_engine') is not None:
+            if mapper is None or db.inspect(mapper).class_ is not TodoList:
+                return g.list_engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
 
 # Initialize SQLAlchemy database object
-db = SQLAlchemy(app)
+db = SQLAlchemy(app, session_options={'class_': ListRoutingSession})
+
+# Milliseconds SQLite itself retries on a busy database before giving up
+SQLITE_BUSY_TIMEOUT_MS = 30000
+
+# Tune every new SQLite connection for concurrent use: WAL lets readers run alongside the writer,
+# synchronous=NORMAL only fsyncs at checkpoints (safe in WAL mode), busy_timeout waits for locks.
+@db.event.listens_for(Engine, 'connect')
+def configure_sqlite_connection(dbapi_connection, connection_record):
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA synchronous=NORMAL')
+        cursor.execute(f'PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}')
+        cursor.close()
+
+# The list used when a request names none; todos from before lists existed belong to it
+DEFAULT_LIST_ID = 1
+
+# Catalog of todo lists. database is the path of the list's own SQLite file, or None if its
+# todos live in the main database.
+class TodoList(db.Model):
+    __tablename__ = 'lists'
+    __table_args__ = {'sqlite_autoincrement': True} # Never reuse the id (and file name) of a deleted list
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    database = db.Column(db.String(500), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.datetime.now)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'created_at': self.created_at.isoformat(),
+            'sharded': self.database is not None
+        }
 
 # Define Todo item model
 class Todo(db.Model):
     __tablename__ = 'todos'
+    __table_args__ = (
+        # Serves a list's order (and MAX(position)) without a sort, for all todos or one completion state
+        db.Index('ix_todos_list_position', 'list_id', 'position', db.text('created_at DESC'), db.text('id DESC')),
+        db.Index('ix_todos_list_completed', 'list_id', 'is_completed', 'position', db.text('created_at DESC'), db.text('id DESC')),
+        # Range filters on priority and due date
+        db.Index('ix_todos_priority', 'priority'),
+        db.Index('ix_todos_due_date', 'due_date'),
+    )
     id = db.Column(db.Integer, primary_key=True)
+    list_id = db.Column(db.Integer, nullable=False, default=DEFAULT_LIST_ID)
     content = db.Column(db.String(200), nullable=False)
     is_completed = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.datetime.now)
     due_date = db.Column(db.DateTime, nullable=True)
     priority = db.Column(db.Integer, default=0)
     position = db.Column(db.Integer, nullable=False, default=0) # New: Position for ordering
+    completed_at = db.Column(db.DateTime, nullable=True) # When it was last marked completed; drives archiving
+    version = db.Column(db.Integer, nullable=False, default=1) # Bumped by every change to the row (see Row Versions)
 
     def to_dict(self):
         return {
@@ -34,58 +306,1302 @@ class Todo(db.Model):
             'created_at': self.created_at.isoformat(),
             'due_date': self.due_date.isoformat() if self.due_date else None,
             'priority': self.priority,
-            'position': self.position # Include position in dict
+            'position': self.position, # Include position in dict
+            'version': self.version
         }
 
+# Order of every listing (within one list): position, then newest first; the id makes it a total order for keyset cursors
+TODO_LIST_ORDER = (Todo.position.asc(), Todo.created_at.desc(), Todo.id.desc())
+
+# Change log: one row per mutation of a todo, used for incremental (delta) sync.
+# The autoincrement primary key doubles as the table-level version counter.
+class TodoChange(db.Model):
+    __tablename__ = 'todo_changes'
+    __table_args__ = {'sqlite_autoincrement': True} # Never reuse versions, even after pruning
+    version = db.Column(db.Integer, primary_key=True)
+    list_id = db.Column(db.Integer, nullable=False, default=DEFAULT_LIST_ID)
+    todo_id = db.Column(db.Integer, nullable=False, index=True)
+    op = db.Column(db.String(10), nullable=False) # 'upsert' or 'delete'
+    changed_at = db.Column(db.DateTime, default=datetime.datetime.now)
+
+# Completed todos moved out of the todos table by the archive job (see Archive Helpers).
+# Todo ids can be reused once the highest one is gone, so the archive has its own key.
+class ArchivedTodo(db.Model):
+    __tablename__ = 'archived_todos'
+    __table_args__ = (
+        db.Index('ix_archived_todos_list_order', 'list_id', db.text('completed_at DESC'), db.text('archive_id DESC')),
+        {'sqlite_autoincrement': True}
+    )
+    archive_id = db.Column(db.Integer, primary_key=True)
+    list_id = db.Column(db.Integer, nullable=False, default=DEFAULT_LIST_ID)
+    todo_id = db.Column(db.Integer, nullable=False, index=True)
+    content = db.Column(db.String(200), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False)
+    due_date = db.Column(db.DateTime, nullable=True)
+    priority = db.Column(db.Integer, default=0)
+    completed_at = db.Column(db.DateTime, nullable=False)
+    archived_at = db.Column(db.DateTime, default=datetime.datetime.now)
+
+    def to_dict(self):
+        return {
+            'id': self.todo_id,
+            'content': self.content,
+            'is_completed': True,
+            'created_at': self.created_at.isoformat(),
+            'due_date': self.due_date.isoformat() if self.due_date else None,
+            'priority': self.priority,
+            'completed_at': self.completed_at.isoformat(),
+            'archived_at': self.archived_at.isoformat()
+        }
+
+# Responses of mutating requests sent with an Idempotency-Key header, so a retried request gets
+# the original response instead of running twice (see Idempotency Keys). Kept next to the list's
+# data, so the key is committed in the same transaction as the change it guards.
+class IdempotencyKey(db.Model):
+    __tablename__ = 'idempotency_keys'
+    __table_args__ = {'sqlite_autoincrement': True}
+    id = db.Column(db.Integer, primary_key=True) # Insertion order, bounds the number of stored keys
+    key = db.Column(db.String(255), nullable=False, unique=True)
+    fingerprint = db.Column(db.String(64), nullable=False) # Hash of method, URL and body
+    created_at = db.Column(db.DateTime, default=datetime.datetime.now, index=True)
+    status = db.Column(db.Integer, nullable=True) # None while the first request is still running
+    mimetype = db.Column(db.String(100), nullable=True)
+    body = db.Column(db.LargeBinary, nullable=True)
+
+# Spacing between neighbouring positions, so a move can usually slot a todo in without renumbering others
+POSITION_GAP = 1024
+
+# When a move finds no free position, this many todos on each side of the anchor are renumbered
+# (doubling until they fit between their outer neighbours with at least REBALANCE_MIN_GAP spacing)
+REBALANCE_WINDOW = 8
+REBALANCE_MIN_GAP = 32
+
+# Upper bound on operations accepted by one POST /todos/batch request
+BATCH_OPERATION_LIMIT = 1000
+
+# Rows per fetch of GET /todos/export, and per insert and transaction of POST /todos/import
+EXPORT_BATCH_SIZE = 1000
+IMPORT_CHUNK_SIZE = 1000
+
+# Largest page size accepted by GET /todos?limit=
+MAX_PAGE_SIZE = 500
+
+# Seconds between keep-alive comments on idle event streams
+EVENT_STREAM_HEARTBEAT = 15
+
+# Seconds between change log checks on idle event streams. Commits in this process wake the streams
+# at once; commits made by other worker processes are only seen by polling. 0 turns polling off.
+EVENT_STREAM_POLL_INTERVAL = float(os.environ.get('TODO_EVENT_POLL_INTERVAL', 0))
+
+# Encoded read responses (distinct URL and representation pairs) kept in memory, and the bytes they
+# may hold in total. A body larger than RESPONSE_CACHE_ENTRY_BYTES (e.g. an unpaged /todos of a big
+# list) is not cached at all, so a few of them can't push everything else out.
+RESPONSE_CACHE_SIZE = 256
+RESPONSE_CACHE_MAX_BYTES = int(os.environ.get('TODO_RESPONSE_CACHE_BYTES', 32 * 1024 * 1024))
+RESPONSE_CACHE_ENTRY_BYTES = RESPONSE_CACHE_MAX_BYTES // 16
+
+# Media types of the read responses, and the field order of the columnar form
+JSON_MIMETYPE = 'application/json'
+COLUMNS_MIMETYPE = 'application/vnd.todos.columns+json'
+MSGPACK_MIMETYPE = 'application/msgpack'
+TODO_FIELDS = ('id', 'content', 'is_completed', 'created_at', 'due_date', 'priority', 'position', 'version')
+
+# Read responses smaller than this (bytes) are sent uncompressed; level trades CPU for size (1-9)
+COMPRESS_MIN_SIZE = 1024
+COMPRESS_LEVEL = 6
+
+# Histogram bucket bounds of the /metrics output
+METRIC_SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+METRIC_BYTES_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000, 100000000)
+METRIC_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 1000)
+
+# Number of change log entries kept; clients that fall further behind must do a full reload
+CHANGE_LOG_RETENTION = 10000
+
+# Completed todos older than this many days move to the archive; the job runs every
+# TODO_ARCHIVE_INTERVAL seconds (0 turns it off) and moves at most ARCHIVE_BATCH_SIZE rows per transaction
+ARCHIVE_AFTER_DAYS = float(os.environ.get('TODO_ARCHIVE_AFTER_DAYS', 7))
+ARCHIVE_INTERVAL = float(os.environ.get('TODO_ARCHIVE_INTERVAL', 3600))
+ARCHIVE_BATCH_SIZE = 1000
+
+# Idempotency keys are remembered for this many seconds, and at most this many per database
+IDEMPOTENCY_KEY_TTL = 24 * 3600
+IDEMPOTENCY_MAX_KEYS = 10000
+
+# Tables holding the data of a list, present in the main database and in every list's own file
+LIST_DATA_TABLES = (Todo.__table__, TodoChange.__table__, ArchivedTodo.__table__, IdempotencyKey.__table__)
+
+# Indexes replaced by the per-list ones
+OBSOLETE_INDEXES = ('ix_todos_list_order', 'ix_todos_completed_order', 'ix_archived_todos_order')
+
+# Create missing tables and indexes in the main database, and the default list
+def init_db():
+    db.create_all()
+    init_list_storage(db.engine)
+    if db.session.get(TodoList, DEFAULT_LIST_ID) is None:
+        db.session.add(TodoList(id=DEFAULT_LIST_ID, name='Todos'))
+        db.session.commit()
+
+# Create or upgrade the list data tables of a database (create_all skips new indexes on existing tables)
+def init_list_storage(engine):
+    db.metadata.create_all(engine, tables=LIST_DATA_TABLES)
+    upgrade_schema(engine)
+    for table in LIST_DATA_TABLES:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
+    init_search_index(engine)
+
+# Add the columns introduced since a database was created
+def upgrade_schema(engine):
+    # Read before the transaction: the inspector uses a connection of its own
+    inspector = db.inspect(engine)
+    columns = {table.name: {column['name'] for column in inspector.get_columns(table.name)} for table in LIST_DATA_TABLES}
+    with engine.begin() as connection:
+        if 'completed_at' not in columns['todos']:
+            # Todos completed before archiving existed count from now
+            connection.execute(db.text("ALTER TABLE todos ADD COLUMN completed_at DATETIME"))
+            connection.execute(Todo.__table__.update().where(Todo.__table__.c.is_completed == True)
+                               .values(completed_at=datetime.datetime.now()))
+        if 'version' not in columns['todos']:
+            connection.execute(db.text("ALTER TABLE todos ADD COLUMN version INTEGER NOT NULL DEFAULT 1"))
+        for table in LIST_DATA_TABLES:
+            if 'list_id' in table.c and 'list_id' not in columns[table.name]: # Idempotency keys have none
+                connection.execute(db.text(f"ALTER TABLE {table.name} ADD COLUMN list_id INTEGER NOT NULL DEFAULT {DEFAULT_LIST_ID}"))
+        for name in OBSOLETE_INDEXES:
+            connection.execute(db.text(f"DROP INDEX IF EXISTS {name}"))
+
+# --- Full-Text Search Index ---
+# todos_fts is an external-content FTS5 table: it stores only the index and reads content from todos.
+# Triggers keep it in sync with every insert, delete and content update, whichever code path writes.
+
+FTS_TRIGGERS_SQL = [
+    """CREATE TRIGGER IF NOT EXISTS todos_fts_insert AFTER INSERT ON todos BEGIN
+        INSERT INTO todos_fts(rowid, content) VALUES (new.id, new.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS todos_fts_delete AFTER DELETE ON todos BEGIN
+        INSERT INTO todos_fts(todos_fts, rowid, content) VALUES ('delete', old.id, old.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS todos_fts_update AFTER UPDATE OF content ON todos BEGIN
+        INSERT INTO todos_fts(todos_fts, rowid, content) VALUES ('delete', old.id, old.content);
+        INSERT INTO todos_fts(rowid, content) VALUES (new.id, new.content);
+    END"""
+]
+
+todos_fts = db.table('todos_fts', db.column('rowid'), db.column('rank'))
+
+def init_search_index(engine):
+    with engine.begin() as connection:
+        exists = connection.execute(db.text("SELECT 1 FROM sqlite_master WHERE name = 'todos_fts'")).first()
+        if not exists:
+            # Prefix indexes make the as-you-type prefix queries cheap
+            connection.execute(db.text("CREATE VIRTUAL TABLE todos_fts USING fts5("
+                                       "content, content='todos', content_rowid='id', prefix='2 3')"))
+            connection.execute(db.text("INSERT INTO todos_fts(todos_fts) VALUES ('rebuild')")) # Index existing todos
+        for trigger_sql in FTS_TRIGGERS_SQL:
+            connection.execute(db.text(trigger_sql))
+
+# Turn user input into an FTS5 query: every word quoted (no query syntax) and prefix-matched
+def fts_query(text):
+    return ' '.join('"' + word.replace('"', '""') + '"*' for word in text.split())
+
+# --- List Storage ---
+# Every request works on one list, named by ?list_id= (the default list when absent). Its todos,
+# change log and archive live in the main database, or in the list's own SQLite file; ListRoutingSession
+# sends the queries to g.list_engine. Positions, versions and search are all scoped to the list.
+
+list_engines = {} # list id -> engine for the list's own database file
+list_engines_lock = threading.Lock()
+
+def list_engine(list_id, database):
+    with list_engines_lock:
+        engine = list_engines.get(list_id)
+        if engine is None:
+            engine = create_engine('sqlite:///' + database, **FILE_ENGINE_OPTIONS)
+            init_list_storage(engine) # Also upgrades files written by older versions
+            list_engines[list_id] = engine
+        return engine
+
+# Close a deleted list's engine and remove its database file
+def drop_list_storage(list_id, database):
+    with list_engines_lock:
+        engine = list_engines.pop(list_id, None)
+    if engine is not None:
+        engine.dispose()
+    for path in (database, database + '-wal', database + '-shm'):
+        if os.path.exists(path):
+            os.remove(path)
+
+# Make the rest of this request (or app context) work on the given list
+def use_todo_list(list_id, database=None):
+    g.list_id = list_id
+    g.list_engine = list_engine(list_id, database) if database else None
+
+def current_list_id():
+    return g.get('list_id', DEFAULT_LIST_ID) if has_app_context() else DEFAULT_LIST_ID
+
+# Filter for rows of the current list
+def in_current_list(model=Todo):
+    return model.list_id == current_list_id()
+
+@app.before_request
+def select_todo_list():
+    list_id = request.args.get('list_id', type=int)
+    if list_id is None or list_id == DEFAULT_LIST_ID:
+        return # The default list always lives in the main database, no lookup needed
+    todo_list = db.session.get(TodoList, list_id)
+    if todo_list is None:
+        return jsonify({"error": f"List {list_id} not found."}), 404
+    use_todo_list(todo_list.id, todo_list.database)
+
+# --- Idempotency Keys ---
+# A POST/PUT/DELETE carrying an Idempotency-Key header claims the key in the same transaction as
+# its changes. A retry with the same key and request gets the stored response replayed (marked
+# Idempotent-Replayed); one arriving while the first is still running gets 409. Requests that fail
+# without committing leave no claim behind, so they can simply be retried.
+
+IDEMPOTENT_METHODS = ('POST', 'PUT', 'DELETE')
+STREAMED_BODY_ENDPOINTS = ('import_todos',) # Body read as a stream, so it can't be part of the fingerprint
+
+def request_fingerprint():
+    digest = hashlib.sha256(f"{request.method} {request.full_path}\n".encode())
+    if request.endpoint not in STREAMED_BODY_ENDPOINTS:
+        digest.update(request.get_data())
+    return digest.hexdigest()
+
+def replay_response(claim):
+    if claim.status is None:
+        response = jsonify({"error": "A request with this Idempotency-Key is still in progress."})
+        response.status_code = 409
+        response.headers['Retry-After'] = '1'
+        return response
+    response = app.response_class(claim.body, status=claim.status, mimetype=claim.mimetype)
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+# Runs after select_todo_list, so the key is looked up in the database of the request's list
+@app.before_request
+def check_idempotency_key():
+    key = request.headers.get('Idempotency-Key')
+    if key is None or request.method not in IDEMPOTENT_METHODS:
+        return
+    if not key or len(key) > 255:
+        return jsonify({"error": "Idempotency-Key must be 1 to 255 characters."}), 400
+
+    fingerprint = request_fingerprint()
+    claim = IdempotencyKey.query.filter_by(key=key).first()
+    expired = datetime.datetime.now() - datetime.timedelta(seconds=IDEMPOTENCY_KEY_TTL)
+    if claim is not None and claim.created_at >= expired:
+        if claim.fingerprint != fingerprint:
+            return jsonify({"error": "Idempotency-Key was already used for a different request."}), 422
+        return replay_response(claim)
+
+    # Claim the key; it is written by the handler's own flush and commit
+    if claim is None:
+        claim = IdempotencyKey(key=key)
+        db.session.add(claim)
+    claim.fingerprint = fingerprint
+    claim.created_at = datetime.datetime.now()
+    claim.status = claim.mimetype = claim.body = None
+    g.idempotency_claim = claim
+
+# A concurrent request claimed the same key first (it held the write lock): answer like a retry would
+@app.errorhandler(IntegrityError)
+def handle_integrity_error(error):
+    db.session.rollback()
+    key = request.headers.get('Idempotency-Key')
+    claim = IdempotencyKey.query.filter_by(key=key).first() if g.get('idempotency_claim') is not None else None
+    if claim is None:
+        raise error
+    return replay_response(claim)
+
+@app.after_request
+def store_idempotent_response(response):
+    claim = g.pop('idempotency_claim', None)
+    # Only if the handler committed the claim along with its changes
+    if claim is not None and db.inspect(claim).persistent and not db.inspect(claim).modified:
+        claim.status = response.status_code
+        claim.mimetype = response.mimetype
+        claim.body = response.get_data()
+        prune_idempotency_keys()
+        db.session.commit()
+    return response
+
+def prune_idempotency_keys():
+    newest_id = db.session.query(db.func.max(IdempotencyKey.id)).scalar() or 0
+    expired = datetime.datetime.now() - datetime.timedelta(seconds=IDEMPOTENCY_KEY_TTL)
+    IdempotencyKey.query.filter(db.or_(IdempotencyKey.id <= newest_id - IDEMPOTENCY_MAX_KEYS,
+                                       IdempotencyKey.created_at < expired)).delete(synchronize_session=False)
+
+# --- Change Log Helpers ---
+
+# Record that a todo was created/updated ('upsert') or deleted ('delete') in the current transaction
+def record_change(todo_id, op='upsert'):
+    db.session.add(TodoChange(list_id=current_list_id(), todo_id=todo_id, op=op))
+
+# Bulk variant of record_change for operations touching many rows
+def record_changes(todo_ids, op='upsert'):
+    if todo_ids:
+        list_id = current_list_id()
+        db.session.execute(db.insert(TodoChange), [{'list_id': list_id, 'todo_id': todo_id, 'op': op} for todo_id in todo_ids])
+
+# Current table-level version (0 for an empty log). Lists sharing the main database share the counter.
+def current_version():
+    return db.session.query(db.func.max(TodoChange.version)).scalar() or 0
+
+# Drop change log entries older than the retention window
+def prune_change_log():
+    oldest_kept = current_version() - CHANGE_LOG_RETENTION
+    if oldest_kept > 0:
+        TodoChange.query.filter(TodoChange.version <= oldest_kept).delete(synchronize_session=False)
+
+# Changes between since and version as {'version', 'todos', 'deleted'}.
+# Returns None if since is unknown or already pruned from the log: the client has to reload everything.
+def collect_changes(since, version):
+    oldest_version = db.session.query(db.func.min(TodoChange.version)).scalar()
+    if since > version or (oldest_version is not None and since < oldest_version - 1):
+        return None
+
+    # Collapse the log to the set of touched ids; the rows themselves hold the latest state
+    changed_ids = {todo_id for (todo_id,) in db.session.query(TodoChange.todo_id)
+                   .filter(TodoChange.version > since, TodoChange.version <= version, in_current_list(TodoChange)).distinct()}
+    todos = fetch_todo_dicts(todo_rows_select().where(Todo.id.in_(changed_ids))) if changed_ids else []
+    deleted_ids = changed_ids - {todo['id'] for todo in todos} # Touched ids without a row were deleted
+    return {
+        'version': version,
+        'todos': todos,
+        'deleted': sorted(deleted_ids)
+    }
+
+# --- Commit Notifications ---
+
+# Counts commits in this process so waiting event streams wake up as soon as something changes
+class CommitCounter:
+    def __init__(self):
+        self.value = 0
+        self.condition = threading.Condition()
+
+    def increment(self):
+        with self.condition:
+            self.value += 1
+            self.condition.notify_all()
+
+    # Wait until a commit after `seen`; returns False on timeout
+    def wait_for_commit(self, seen, timeout):
+        with self.condition:
+            return self.condition.wait_for(lambda: self.value != seen, timeout)
+
+commit_counter = CommitCounter()
+
+# --- Response Cache ---
+
+# Encoded read responses keyed by request path, each valid for exactly one table version.
+# Commits in this process clear it; the version check also catches writes made by other processes.
+class ResponseCache:
+    def __init__(self, max_entries, max_bytes, max_entry_bytes):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.entries = OrderedDict() # key -> (version, value, size), least recently used first
+        self.bytes = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.skipped = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, key, version):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] != version:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    # size is the encoded body length; entries are evicted until both limits hold again
+    def put(self, key, version, value, size):
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[2]
+            if size > self.max_entry_bytes:
+                self.skipped += 1
+                return
+            self.entries[key] = (version, value, size)
+            self.bytes += size
+            while len(self.entries) > self.max_entries or self.bytes > self.max_bytes:
+                self.bytes -= self.entries.popitem(last=False)[1][2]
+
+    def clear(self):
+        with self.lock:
+            if self.entries:
+                self.entries.clear()
+                self.bytes = 0
+                self.invalidations += 1
+
+    def stats(self):
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses, 'invalidations': self.invalidations,
+                    'skipped': self.skipped, 'entries': len(self.entries), 'max_entries': self.max_entries,
+                    'bytes': self.bytes, 'max_bytes': self.max_bytes}
+
+response_cache = ResponseCache(RESPONSE_CACHE_SIZE, RESPONSE_CACHE_MAX_BYTES, RESPONSE_CACHE_ENTRY_BYTES)
+
+@db.event.listens_for(db.session, 'after_commit')
+def notify_commit(session):
+    response_cache.clear()
+    commit_counter.increment()
+
+# --- Metrics ---
+# Request, SQL and commit instrumentation exposed on GET /metrics in the Prometheus text format.
+# Counts are per process (each gunicorn worker reports its own).
+
+class Histogram:
+    def __init__(self, name, help_text, label_names, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self.series = {} # label values -> [count per bucket..., sum, count]
+        self.lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self.lock:
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = [0] * len(self.buckets) + [0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            series = sorted(self.series.items())
+        for labels, values in series:
+            label_text = ','.join(f'{name}="{metric_label(value)}"' for name, value in zip(self.label_names, labels))
+            prefix = label_text + ',' if label_text else ''
+            cumulative = 0
+            for bound, count in zip(self.buckets, values):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {values[-1]}')
+            suffix = '{' + label_text + '}' if label_text else ''
+            lines.append(f"{self.name}_sum{suffix} {values[-2]}")
+            lines.append(f"{self.name}_count{suffix} {values[-1]}")
+        return lines
+
+def metric_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+# Route template of the current request (bounded label values), '' outside requests
+def metric_route():
+    if not has_request_context():
+        return ''
+    return request.url_rule.rule if request.url_rule else 'unmatched'
+
+request_duration = Histogram('todo_http_request_duration_seconds', "Time to produce a response.",
+                             ('method', 'route', 'status'), METRIC_SECONDS_BUCKETS)
+request_size = Histogram('todo_http_request_size_bytes', "Request body size.", ('method', 'route'), METRIC_BYTES_BUCKETS)
+response_size = Histogram('todo_http_response_size_bytes', "Response body size (as sent, after compression).",
+                          ('method', 'route'), METRIC_BYTES_BUCKETS)
+request_sql_statements = Histogram('todo_http_request_sql_statements', "SQL statements executed per request.",
+                                   ('method', 'route'), METRIC_COUNT_BUCKETS)
+request_sql_duration = Histogram('todo_http_request_sql_seconds', "Time spent executing SQL per request.",
+                                 ('method', 'route'), METRIC_SECONDS_BUCKETS)
+commit_duration = Histogram('todo_db_commit_duration_seconds', "Session commits, including the final flush.",
+                            ('route',), METRIC_SECONDS_BUCKETS)
+lock_wait = Histogram('todo_db_lock_wait_seconds', "Time spent waiting for the SQLite write lock.",
+                      ('route',), METRIC_SECONDS_BUCKETS)
+METRIC_HISTOGRAMS = (request_duration, request_size, response_size, request_sql_statements, request_sql_duration,
+                     commit_duration, lock_wait)
+
+@app.before_request
+def start_request_metrics():
+    g.request_start = time.perf_counter()
+    g.sql_statements = 0
+    g.sql_seconds = 0.0
+
+@app.after_request
+def record_request_metrics(response):
+    if 'request_start' in g: # Missing if an earlier before_request handler failed
+        method, route = request.method, metric_route()
+        request_duration.observe((method, route, response.status_code), time.perf_counter() - g.request_start)
+        request_size.observe((method, route), request.content_length or 0)
+        if not response.is_streamed: # The event stream has no size, and its SQL runs after this point
+            response_size.observe((method, route), response.calculate_content_length() or 0)
+            request_sql_statements.observe((method, route), g.sql_statements)
+            request_sql_duration.observe((method, route), g.sql_seconds)
+    return response
+
+@db.event.listens_for(Engine, 'before_cursor_execute')
+def start_statement_timer(connection, cursor, statement, parameters, context, executemany):
+    # The sqlite3 module would open the transaction itself right before the first write, waiting
+    # inside that statement for the write lock. Opening it here instead (at the same point, as
+    # BEGIN IMMEDIATE) makes the wait, bounded by busy_timeout, measurable on its own.
+    dbapi_connection = cursor.connection
+    if (isinstance(dbapi_connection, sqlite3.Connection) and not dbapi_connection.in_transaction
+            and statement.lstrip()[:7].upper().startswith(('INSERT', 'UPDATE', 'DELETE', 'REPLACE'))):
+        start = time.perf_counter()
+        dbapi_connection.execute('BEGIN IMMEDIATE')
+        lock_wait.observe((metric_route(),), time.perf_counter() - start)
+    connection.info['statement_start'] = time.perf_counter()
+
+@db.event.listens_for(Engine, 'after_cursor_execute')
+def record_statement_metrics(connection, cursor, statement, parameters, context, executemany):
+    if has_request_context() and 'sql_statements' in g:
+        g.sql_statements += 1
+        g.sql_seconds += time.perf_counter() - connection.info['statement_start']
+
+@db.event.listens_for(db.session, 'before_commit')
+def start_commit_timer(session):
+    session.info['commit_start'] = time.perf_counter()
+
+@db.event.listens_for(db.session, 'after_commit')
+def record_commit_metrics(session):
+    start = session.info.pop('commit_start', None)
+    if start is not None:
+        commit_duration.observe((metric_route(),), time.perf_counter() - start)
+
+def render_metrics():
+    lines = []
+    for histogram in METRIC_HISTOGRAMS:
+        lines.extend(histogram.render())
+    cache = response_cache.stats()
+    for key, metric_type, help_text in (
+        ('hits', 'counter', "Read responses served from the response cache."),
+        ('misses', 'counter', "Read responses built because the cache had no current entry."),
+        ('invalidations', 'counter', "Times a commit cleared the response cache."),
+        ('skipped', 'counter', "Read responses too large to cache."),
+        ('entries', 'gauge', "Responses currently cached."),
+        ('bytes', 'gauge', "Encoded bytes of the responses currently cached.")
+    ):
+        name = f"todo_response_cache_{key}" + ('_total' if metric_type == 'counter' else '')
+        lines.extend([f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}", f"{name} {cache[key]}"])
+    return '\n'.join(lines) + '\n'
+
+# --- Position Helpers ---
+
+# Renumber the todos around anchor (ignoring the todo being moved) so the slots next to it have room
+# again, keeping their order. Only needed when repeated moves have used up a gap. The window grows
+# from REBALANCE_WINDOW rows per side until its rows fit between the first todos outside it, so a
+# rebalance touches a few rows and change log entries, not the whole list. Versions stay as they are:
+# the order doesn't change, so writes based on the old versions are still valid.
+def rebalance_around(anchor, moving_id):
+    others = Todo.query.filter(in_current_list(), Todo.id != moving_id, Todo.id != anchor.id)
+    key = (anchor.position, anchor.created_at, anchor.id)
+    span = REBALANCE_WINDOW
+    while True:
+        earlier = (others.filter(before_sort_key(*key))
+                   .order_by(Todo.position.desc(), Todo.created_at.asc(), Todo.id.asc()).limit(span + 1).all())
+        later = others.filter(after_sort_key(*key)).order_by(*TODO_LIST_ORDER).limit(span + 1).all()
+        # The first todo outside the window on each side keeps its position and bounds the window
+        lower = earlier.pop().position if len(earlier) > span else None
+        upper = later.pop().position if len(later) > span else None
+        window = earlier[::-1] + [anchor] + later
+        if lower is not None and upper is not None:
+            spacing = (upper - lower) // (len(window) + 1)
+            if spacing < REBALANCE_MIN_GAP:
+                span *= 2
+                continue
+            positions = [lower + (index + 1) * spacing for index in range(len(window))]
+        elif upper is not None:
+            positions = [upper - (len(window) - index) * POSITION_GAP for index in range(len(window))]
+        else:
+            start = lower if lower is not None else 0
+            positions = [start + (index + 1) * POSITION_GAP for index in range(len(window))]
+        break
+
+    todo_ids = [todo.id for todo in window]
+    db.session.execute(db.update(Todo), [{'id': todo_id, 'position': position}
+                                         for todo_id, position in zip(todo_ids, positions)])
+    record_changes(todo_ids)
+    db.session.expire_all() # Loaded todos still hold their old positions
+    app.logger.info(f"Rebalanced positions of {len(todo_ids)} todos around todo {anchor.id}.")
+
+# Find the free position directly before or after anchor (ignoring the todo being moved).
+# Returns None when there is no integer left between the two neighbours.
+def position_next_to(anchor, moving_id, before):
+    others = Todo.query.filter(in_current_list(), Todo.id != moving_id, Todo.id != anchor.id)
+    if others.filter(Todo.position == anchor.position).first():
+        return None # Tied positions have no room in between, renumber first
+    if before:
+        upper = anchor.position
+        lower = (db.session.query(db.func.max(Todo.position))
+                 .filter(in_current_list(), Todo.id != moving_id, Todo.position < upper).scalar())
+        lower = lower if lower is not None else upper - 2 * POSITION_GAP
+    else:
+        lower = anchor.position
+        upper = (db.session.query(db.func.min(Todo.position))
+                 .filter(in_current_list(), Todo.id != moving_id, Todo.position > lower).scalar())
+        upper = upper if upper is not None else lower + 2 * POSITION_GAP
+    position = (lower + upper) // 2
+    return position if lower < position < upper else None
+
+# Move todo directly before or after anchor, touching only the moved row in the common case
+def place_todo(todo, anchor, before):
+    position = position_next_to(anchor, todo.id, before)
+    if position is None:
+        rebalance_around(anchor, todo.id)
+        position = position_next_to(anchor, todo.id, before)
+    todo.position = position
+    record_change(todo.id)
+
+# --- Todo Operation Helpers ---
+# Shared by the single-item endpoints and POST /todos/batch. They raise ApiError
+# instead of returning a response, so a batch can roll back on the first failure.
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+    # Response body; call after the rollback
+    def to_dict(self):
+        return {"error": self.message}
+
+# The todo was changed by someone else since the version the client based its write on
+class VersionConflict(ApiError):
+    def __init__(self, todo_id):
+        super().__init__(f"Todo {todo_id} was changed since the given version.", 409)
+        self.todo_id = todo_id
+
+    def to_dict(self):
+        todo = db.session.get(Todo, self.todo_id) # Read after the rollback: the current row, or None if deleted
+        return {"error": self.message, "todo": todo.to_dict() if todo is not None else None}
+
+@app.errorhandler(ApiError)
+def handle_api_error(error):
+    db.session.rollback()
+    return jsonify(error.to_dict()), error.status
+
+def get_todo_or_error(todo_id):
+    todo = db.session.get(Todo, todo_id) if isinstance(todo_id, int) else None
+    if todo is None or todo.list_id != current_list_id():
+        raise ApiError(f"Todo {todo_id} not found.", 404)
+    return todo
+
+def get_todo_or_404(todo_id):
+    return Todo.query.filter(Todo.id == todo_id, in_current_list()).first_or_404()
+
+def parse_due_date(value):
+    if not value:
+        return None
+    try:
+        return datetime.datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise ApiError("Invalid 'due_date', expected an ISO 8601 date.")
+
+# bool is a subclass of int, so True would otherwise pass as 1
+def parse_int_field(data, name):
+    value = data[name]
+    if not isinstance(value, int) or isinstance(value, bool):
+        raise ApiError(f"Invalid '{name}', expected an integer.")
+    return value
+
+def parse_bool_field(data, name):
+    value = data[name]
+    if not isinstance(value, bool):
+        raise ApiError(f"Invalid '{name}', expected true or false.")
+    return value
+
+# Validate request data for a new todo and return its column values
+def new_todo_fields(data):
+    if not isinstance(data.get('content'), str) or not data['content'].strip():
+        raise ApiError("Content is required")
+    return {
+        'content': data['content'].strip(),
+        'due_date': parse_due_date(data.get('due_date')),
+        'priority': parse_int_field(data, 'priority') if 'priority' in data else 0
+    }
+
+# Insert new todos at the end of the list with a single flush
+def insert_todos(fields_list):
+    # Place new todos one gap after the list's current maximum (an index lookup, not a scan)
+    max_position = db.session.query(db.func.max(Todo.position)).filter(in_current_list()).scalar()
+    position = max_position if max_position is not None else 0
+    list_id = current_list_id()
+    new_todos = []
+    for fields in fields_list:
+        position += POSITION_GAP
+        new_todos.append(Todo(list_id=list_id, position=position, **fields))
+    db.session.add_all(new_todos)
+    db.session.flush() # Assign the ids so the changes can be recorded
+    record_changes([todo.id for todo in new_todos])
+    return new_todos
+
+def update_todo_fields(todo, data, expected=None):
+    if not isinstance(data, dict):
+        raise ApiError("Invalid request. A JSON object with the fields to change is required.")
+    if 'content' in data and (not isinstance(data['content'], str) or not data['content'].strip()):
+        raise ApiError("Content must be a non-empty string.")
+    # Check every field before touching the row, so a bad value can't reach the autoflush
+    is_completed = parse_bool_field(data, 'is_completed') if 'is_completed' in data else None
+    due_date = parse_due_date(data['due_date']) if 'due_date' in data else None
+    priority = parse_int_field(data, 'priority') if 'priority' in data else None
+    position = parse_int_field(data, 'position') if 'position' in data else None
+    bump_version(todo, expected)
+    if 'content' in data:
+        todo.content = data['content'].strip()
+    if is_completed is not None:
+        if is_completed and not todo.is_completed:
+            todo.completed_at = datetime.datetime.now()
+        elif not is_completed:
+            todo.completed_at = None
+        todo.is_completed = is_completed
+    if 'due_date' in data:
+        todo.due_date = due_date
+    if priority is not None:
+        todo.priority = priority
+    if position is not None: # Allow updating position directly
+        todo.position = position
+    record_change(todo.id)
+
+# Move todo next to the anchor named by 'before_id' or 'after_id' in data
+def move_todo_next_to(todo, data, expected=None):
+    if not isinstance(data, dict):
+        raise ApiError("Invalid request. A JSON object with the fields to change is required.")
+    bump_version(todo, expected)
+    before_id = data.get('before_id')
+    after_id = data.get('after_id')
+    if (before_id is None) == (after_id is None):
+        raise ApiError("Exactly one of 'before_id' or 'after_id' is required.")
+
+    anchor = db.session.get(Todo, before_id if before_id is not None else after_id)
+    if anchor is None or anchor.list_id != todo.list_id:
+        raise ApiError("Anchor todo not found.", 404)
+    if anchor.id == todo.id:
+        raise ApiError("A todo cannot be moved next to itself.")
+    place_todo(todo, anchor, before=before_id is not None)
+
+def delete_todo_row(todo, expected=None):
+    bump_version(todo, expected) # Only checks the version, the row is gone afterwards
+    db.session.delete(todo)
+    db.session.flush() # Later operations must not find it any more
+    record_change(todo.id, 'delete')
+
+# Delete every completed todo of the list with one statement and return their ids
+def delete_completed_todos():
+    completed_ids = [todo_id for (todo_id,) in db.session.query(Todo.id).filter(in_current_list(), Todo.is_completed == True)]
+    if completed_ids:
+        Todo.query.filter(Todo.id.in_(completed_ids)).delete()
+        record_changes(completed_ids, 'delete')
+    return completed_ids
+
+# --- Row Versions ---
+# Every todo carries a version that each change to it increments. A write may name the version
+# it was based on (a 'version' field, or If-Match with the todo's ETag on single-todo requests);
+# if the todo has changed since, the write fails with 409 and the current row instead of
+# silently overwriting another device's edit. Writes without a version apply unconditionally.
+
+# The version a write is based on, or None for an unconditional write
+def expected_version(data, use_if_match=True):
+    value = data.get('version') if isinstance(data, dict) else None
+    if value is None and use_if_match and request.if_match:
+        if request.if_match.star_tag:
+            return None # '*' only asks for the todo to exist
+        tags = request.if_match.as_set()
+        value = tags.pop() if len(tags) == 1 else None
+        if value is None or not value.isdigit():
+            raise ApiError("Invalid If-Match, expected the todo's ETag.")
+        return int(value)
+    if value is not None and (not isinstance(value, int) or isinstance(value, bool)):
+        raise ApiError("Invalid 'version', expected an integer.")
+    return value
+
+# Increment the todo's version, checking it against expected first. The check and the increment are
+# one UPDATE, which also takes the write lock, so of two writers based on the same version only one
+# gets through, even when both loaded the todo before either committed.
+def bump_version(todo, expected=None):
+    if expected is not None and expected != todo.version:
+        raise VersionConflict(todo.id) # Already stale when loaded, no need to lock
+    table = Todo.__table__
+    statement = table.update().where(table.c.id == todo.id).values(version=table.c.version + 1).returning(table.c.version)
+    if expected is not None:
+        statement = statement.where(table.c.version == expected)
+    version = db.session.execute(statement).scalar()
+    if version is None:
+        raise VersionConflict(todo.id)
+    set_committed_value(todo, 'version', version)
+
+# Increment the versions of todos changed by a bulk statement
+def bump_versions(todo_ids):
+    if todo_ids:
+        table = Todo.__table__
+        db.session.execute(table.update().where(table.c.id.in_(todo_ids)).values(version=table.c.version + 1))
+
+def todo_response(todo, status=200):
+    response = jsonify(todo.to_dict())
+    response.status_code = status
+    response.set_etag(str(todo.version)) # For If-Match on the next write to this todo
+    return response
+
+# --- Archive Helpers ---
+# Old completed todos move to archived_todos in the background, so the hot table and every list
+# sync only carry live work. Clients see archived todos as deletions through the change log.
+
+# Move one batch of the list's todos completed before cutoff to the archive; returns how many were moved
+def archive_completed_todos(cutoff):
+    table = Todo.__table__
+    candidate_ids = [todo_id for (todo_id,) in db.session.query(Todo.id)
+                     .filter(in_current_list(), Todo.is_completed == True, Todo.completed_at < cutoff)
+                     .limit(ARCHIVE_BATCH_SIZE)]
+    if not candidate_ids:
+        return 0
+    # The delete comes first: it takes the write lock, so a job running in another worker process
+    # can't archive the same rows twice, and RETURNING yields only the rows that are still eligible
+    rows = db.session.execute(
+        table.delete()
+        .where(table.c.id.in_(candidate_ids), table.c.is_completed == True, table.c.completed_at < cutoff)
+        .returning(table.c.id, table.c.content, table.c.created_at, table.c.due_date, table.c.priority, table.c.completed_at)
+    ).all()
+    if rows:
+        archived_at = datetime.datetime.now()
+        db.session.execute(db.insert(ArchivedTodo), [
+            {
+                'list_id': current_list_id(),
+                'todo_id': row.id,
+                'content': row.content,
+                'created_at': row.created_at,
+                'due_date': row.due_date,
+                'priority': row.priority,
+                'completed_at': row.completed_at,
+                'archived_at': archived_at
+            }
+            for row in rows
+        ])
+        record_changes([row.id for row in rows], 'delete')
+    return len(rows)
+
+def run_archive_job():
+    cutoff = datetime.datetime.now() - datetime.timedelta(days=ARCHIVE_AFTER_DAYS)
+    lists = [(todo_list.id, todo_list.database) for todo_list in TodoList.query.order_by(TodoList.id)]
+    total = 0
+    for list_id, database in lists:
+        use_todo_list(list_id, database)
+        while True:
+            moved = archive_completed_todos(cutoff)
+            prune_change_log()
+            db.session.commit()
+            total += moved
+            if moved < ARCHIVE_BATCH_SIZE:
+                break
+    if total:
+        app.logger.info("Archived %d completed todos.", total)
+    return total
+
+archive_job_pid = None # Process whose archive thread is running; forked workers start their own
+archive_job_lock = threading.Lock()
+
+# Start the periodic archive thread of this process, once (checked on every request)
+@app.before_request
+def ensure_archive_job():
+    global archive_job_pid
+    if ARCHIVE_INTERVAL <= 0 or archive_job_pid == os.getpid():
+        return
+    with archive_job_lock:
+        if archive_job_pid == os.getpid():
+            return
+        archive_job_pid = os.getpid()
+
+    def loop():
+        while True:
+            try:
+                with app.app_context():
+                    run_archive_job()
+            except Exception:
+                app.logger.exception("Archiving completed todos failed.")
+            time.sleep(ARCHIVE_INTERVAL)
+
+    threading.Thread(target=loop, name='archive-job', daemon=True).start()
+
+def encode_archive_cursor(archived):
+    key = [archived.completed_at.isoformat(), archived.archive_id]
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+# Archived todos after the cursor in archive order (completed_at DESC, archive_id DESC)
+def after_archive_cursor(cursor):
+    try:
+        completed_at, archive_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        completed_at, archive_id = datetime.datetime.fromisoformat(completed_at), int(archive_id)
+    except (TypeError, ValueError):
+        raise ApiError("Invalid cursor.")
+    return db.and_(ArchivedTodo.completed_at <= completed_at, db.or_(
+        ArchivedTodo.completed_at < completed_at,
+        db.and_(ArchivedTodo.completed_at == completed_at, ArchivedTodo.archive_id < archive_id)
+    ))
+
+# --- Listing Helpers ---
+
+# Opaque keyset cursor holding the sort key of the last todo (as a dict) on a page
+def encode_cursor(todo):
+    key = [todo['position'], todo['created_at'], todo['id']]
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+def decode_cursor(cursor):
+    try:
+        position, created_at, todo_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return int(position), datetime.datetime.fromisoformat(created_at), int(todo_id)
+    except (TypeError, ValueError):
+        raise ApiError("Invalid cursor.")
+
+# Todos that come after the given sort key in TODO_LIST_ORDER
+def after_cursor(cursor):
+    return after_sort_key(*decode_cursor(cursor))
+
+def after_sort_key(position, created_at, todo_id):
+    # The leading 'position >= ?' lets SQLite seek into the order index instead of scanning from the start
+    return db.and_(Todo.position >= position, db.or_(
+        Todo.position > position,
+        db.and_(Todo.position == position, Todo.created_at < created_at),
+        db.and_(Todo.position == position, Todo.created_at == created_at, Todo.id < todo_id)
+    ))
+
+# Todos that come before the given sort key in TODO_LIST_ORDER
+def before_sort_key(position, created_at, todo_id):
+    return db.and_(Todo.position <= position, db.or_(
+        Todo.position < position,
+        db.and_(Todo.position == position, Todo.created_at > created_at),
+        db.and_(Todo.position == position, Todo.created_at == created_at, Todo.id > todo_id)
+    ))
+
+def parse_bool_arg(name):
+    value = request.args[name].lower()
+    if value not in ('true', 'false', '1', '0'):
+        raise ApiError(f"Invalid '{name}', expected true or false.")
+    return value in ('true', '1')
+
+def parse_int_arg(name, default=None):
+    if name not in request.args:
+        return default
+    try:
+        return int(request.args[name])
+    except ValueError:
+        raise ApiError(f"Invalid '{name}', expected an integer.")
+
+def parse_datetime_arg(name):
+    try:
+        return datetime.datetime.fromisoformat(request.args[name])
+    except ValueError:
+        raise ApiError(f"Invalid '{name}', expected an ISO 8601 date.")
+
+# Apply the optional listing filters from the query string
+def filter_todos(statement):
+    if 'is_completed' in request.args:
+        statement = statement.where(Todo.is_completed == parse_bool_arg('is_completed'))
+    if 'priority_min' in request.args:
+        statement = statement.where(Todo.priority >= parse_int_arg('priority_min'))
+    if 'priority_max' in request.args:
+        statement = statement.where(Todo.priority <= parse_int_arg('priority_max'))
+    if 'due_after' in request.args:
+        statement = statement.where(Todo.due_date >= parse_datetime_arg('due_after'))
+    if 'due_before' in request.args:
+        statement = statement.where(Todo.due_date < parse_datetime_arg('due_before'))
+    return statement
+
+# --- Fast Read Path ---
+# Read endpoints skip ORM objects: a Core select returns plain rows that are turned straight into
+# the to_dict() shape. Datetime columns are read as the text SQLite stores
+# ('YYYY-MM-DD HH:MM:SS.ffffff'), which only needs reformatting instead of parsing.
+
+def todo_rows_select():
+    table = Todo.__table__
+    return db.select(
+        table.c.id, table.c.content, table.c.is_completed,
+        db.type_coerce(table.c.created_at, db.String), db.type_coerce(table.c.due_date, db.String),
+        table.c.priority, table.c.position, table.c.version
+    ).where(in_current_list())
+
+# Same output as datetime.isoformat() for a value stored by SQLAlchemy's SQLite DateTime type
+def sqlite_isoformat(value):
+    if value is None:
+        return None
+    value = value.replace(' ', 'T', 1)
+    return value[:-7] if value.endswith('.000000') else value
+
+def fetch_todo_dicts(statement):
+    return [
+        {
+            'id': todo_id,
+            'content': content,
+            'is_completed': is_completed,
+            'created_at': sqlite_isoformat(created_at),
+            'due_date': sqlite_isoformat(due_date),
+            'priority': priority,
+            'position': position,
+            'version': version
+        }
+        for todo_id, content, is_completed, created_at, due_date, priority, position, version in db.session.execute(statement)
+    ]
+
+def dumps(payload):
+    return orjson.dumps(payload) if orjson else json.dumps(payload, separators=(',', ':')).encode()
+
+def loads(data):
+    return orjson.loads(data) if orjson else json.loads(data)
+
+# --- Response Encoding ---
+# Read endpoints negotiate their representation. Accept picks plain JSON (the default), MessagePack,
+# or for todo lists the columnar JSON form {"id": [...], "content": [...], ...}, which names each
+# field once instead of once per row. Accept-Encoding picks gzip or deflate for larger bodies.
+
+def negotiate_mimetype(columns=False):
+    offered = [JSON_MIMETYPE]
+    if columns:
+        offered.append(COLUMNS_MIMETYPE)
+    if msgpack:
+        offered.append(MSGPACK_MIMETYPE)
+    return request.accept_mimetypes.best_match(offered, default=JSON_MIMETYPE)
+
+def negotiate_encoding():
+    return request.accept_encodings.best_match(('gzip', 'deflate'))
+
+def encode_body(payload, mimetype):
+    if mimetype == MSGPACK_MIMETYPE:
+        return msgpack.packb(payload)
+    if mimetype == COLUMNS_MIMETYPE:
+        payload = {field: [todo[field] for todo in payload] for field in TODO_FIELDS}
+    return dumps(payload)
+
+def compress_body(body, encoding):
+    if encoding is None or len(body) < COMPRESS_MIN_SIZE:
+        return body, None # Small bodies fit in a packet anyway
+    if encoding == 'gzip':
+        return gzip.compress(body, COMPRESS_LEVEL, mtime=0), encoding
+    return zlib.compress(body, COMPRESS_LEVEL), encoding # HTTP 'deflate' is the zlib format
+
+def encoded_response(body, mimetype, encoding, headers, version):
+    response = app.response_class(body, mimetype=mimetype, headers=headers)
+    response.vary.update(('Accept', 'Accept-Encoding'))
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.set_etag(str(version), weak=etag_is_weak())
+    return response
+
+# Compressed bytes differ from the identity ones, so the version becomes a weak validator whenever the
+# client accepts a compressed encoding (even if this body was too small to compress). Decided by the
+# request alone, so a 304 carries the same validator as the 200 it revalidates.
+def etag_is_weak():
+    return negotiate_encoding() is not None
+
+def negotiated_response(payload, version, headers=None):
+    mimetype = negotiate_mimetype()
+    body, encoding = compress_body(encode_body(payload, mimetype), negotiate_encoding())
+    return encoded_response(body, mimetype, encoding, headers, version)
+
+# Serve a read response from the cache, or build it with build() -> (payload, headers) and cache it.
+# Each representation is cached on its own, already compressed. columns=True if the payload is a todo list.
+# A request with 'Cache-Control: no-cache' is always built fresh (the benchmarks use it to time the queries).
+def cached_response(version, build, columns=False):
+    mimetype = negotiate_mimetype(columns)
+    encoding = negotiate_encoding()
+    key = (request.full_path, mimetype, encoding)
+    cached = None if request.cache_control.no_cache else response_cache.get(key, version)
+    if cached is None:
+        payload, headers = build()
+        body, body_encoding = compress_body(encode_body(payload, mimetype), encoding)
+        cached = (body, body_encoding, headers)
+        response_cache.put(key, version, cached, len(body))
+    body, body_encoding, headers = cached
+    return encoded_response(body, mimetype, body_encoding, headers, version)
+
+# --- Conditional GET Helpers ---
+
+# The table-level version is the ETag for every read endpoint (see etag_is_weak): any write bumps it
+def client_has_version(version):
+    return request.if_none_match.contains_weak(str(version)) # If-None-Match uses weak comparison
+
+def not_modified(version):
+    response = app.response_class(status=304)
+    response.set_etag(str(version), weak=etag_is_weak())
+    return response
+
 # --- API Interface Definitions ---
+# Every /todos endpoint works on the list given by ?list_id= (the default list when omitted).
 
-# Get all todo items
+# Get todo items: all of them by default, or one page at a time with ?limit= and ?cursor=.
+# Optional filters: is_completed, priority_min, priority_max, due_after, due_before.
 @app.route('/todos', methods=['GET'])
 def get_todos():
-    # Query all todo items, order by position, then by creation time for tie-breaking
-    todos = Todo.query.order_by(Todo.position.asc(), Todo.created_at.desc()).all()
-    return jsonify([todo.to_dict() for todo in todos])
+    # Read the version first: a change committed meanwhile is re-sent by the next delta sync
+    version = current_version()
+    if client_has_version(version):
+        return not_modified(version) # Nothing changed, skip the query and serialization entirely
+
+    response = cached_response(version, build_todos_page, columns=True)
+    response.headers['X-Todos-Version'] = str(version) # Starting point for /todos/changes
+    return response
+
+def build_todos_page():
+    # Order by position, then by creation time (and id) for tie-breaking
+    statement = filter_todos(todo_rows_select())
+    if 'cursor' in request.args:
+        statement = statement.where(after_cursor(request.args['cursor']))
+    statement = statement.order_by(*TODO_LIST_ORDER)
+
+    limit = parse_int_arg('limit')
+    next_cursor = None
+    if limit is None:
+        todos = fetch_todo_dicts(statement)
+    else:
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        todos = fetch_todo_dicts(statement.limit(limit + 1)) # One extra row tells whether another page exists
+        if len(todos) > limit:
+            todos = todos[:limit]
+            next_cursor = encode_cursor(todos[-1])
+    return todos, {'X-Next-Cursor': next_cursor} if next_cursor else {}
+
+# Get the first incomplete todo, all the collapsed overlay shows (null if there is none)
+@app.route('/todos/active', methods=['GET'])
+def get_active_todo():
+    version = current_version()
+    if client_has_version(version):
+        return not_modified(version)
+
+    return cached_response(version, build_active_todo)
+
+def build_active_todo():
+    # A single index seek on ix_todos_list_completed (list_id, is_completed, then list order)
+    todos = fetch_todo_dicts(todo_rows_select().where(Todo.is_completed == False).order_by(*TODO_LIST_ORDER).limit(1))
+    return todos[0] if todos else None, {}
+
+# Search todo content, best matches first; paginate with ?limit= and ?offset= (see X-Next-Offset)
+@app.route('/todos/search', methods=['GET'])
+def search_todos():
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({"error": "Query parameter 'q' is required."}), 400
+
+    version = current_version()
+    if client_has_version(version):
+        return not_modified(version)
+    return cached_response(version, lambda: build_search_page(query), columns=True)
+
+def build_search_page(query):
+    limit = max(1, min(parse_int_arg('limit', 20), MAX_PAGE_SIZE))
+    offset = max(0, parse_int_arg('offset', 0))
+    statement = (todo_rows_select()
+                 .join(todos_fts, todos_fts.c.rowid == Todo.id)
+                 .where(db.literal_column('todos_fts').op('MATCH')(fts_query(query)))
+                 .order_by(todos_fts.c.rank) # bm25 relevance
+                 .limit(limit + 1).offset(offset))
+    todos = fetch_todo_dicts(statement)
+    if len(todos) > limit:
+        return todos[:limit], {'X-Next-Offset': str(offset + limit)}
+    return todos, {}
+
+# Archived (old completed) todos, most recently completed first; paginate with ?limit= and ?cursor=
+@app.route('/todos/archive', methods=['GET'])
+def get_archived_todos():
+    version = current_version() # Archiving is recorded in the change log, so the version covers it
+    if client_has_version(version):
+        return not_modified(version)
+    return cached_response(version, build_archive_page)
+
+def build_archive_page():
+    query = ArchivedTodo.query.filter(in_current_list(ArchivedTodo))
+    if 'cursor' in request.args:
+        query = query.filter(after_archive_cursor(request.args['cursor']))
+    limit = max(1, min(parse_int_arg('limit', 100), MAX_PAGE_SIZE))
+    archived = query.order_by(ArchivedTodo.completed_at.desc(), ArchivedTodo.archive_id.desc()).limit(limit + 1).all()
+    if len(archived) > limit:
+        return [todo.to_dict() for todo in archived[:limit]], {'X-Next-Cursor': encode_archive_cursor(archived[limit - 1])}
+    return [todo.to_dict() for todo in archived], {}
+
+# Hit/miss counters of the in-memory response cache
+@app.route('/cache/stats', methods=['GET'])
+def get_cache_stats():
+    return jsonify(response_cache.stats())
+
+# Prometheus scrape endpoint
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    return app.response_class(render_metrics(), mimetype='text/plain; version=0.0.4')
+
+# Get only the todos changed since a given version (incremental sync)
+@app.route('/todos/changes', methods=['GET'])
+def get_todo_changes():
+    since = request.args.get('since', type=int)
+    if since is None or since < 0:
+        return jsonify({"error": "Query parameter 'since' (non-negative integer) is required."}), 400
+
+    version = current_version()
+    if client_has_version(version):
+        return not_modified(version)
+    changes = collect_changes(since, version)
+    if changes is None:
+        return jsonify({"error": "Version is no longer available, reload the full list.", "version": version}), 410
+
+    return negotiated_response(changes, version)
+
+# Stream change events (Server-Sent Events) as they are committed.
+# Each 'changes' event carries the same payload as /todos/changes plus the version it starts from;
+# a 'reset' event means the client must reload everything. Resumes from ?since= or Last-Event-ID.
+@app.route('/todos/events', methods=['GET'])
+def stream_todo_events():
+    since = request.headers.get('Last-Event-ID', type=int)
+    if since is None:
+        since = request.args.get('since', type=int)
+    if since is None:
+        since = current_version() # Only changes from now on
+    db.session.close() # Don't hold a pooled connection between events
+
+    def generate():
+        yield ": connected\n\n" # Sends the headers right away instead of at the first event
+        version = since
+        last_sent = time.monotonic()
+        while True:
+            seen_commits = commit_counter.value
+            current = current_version()
+            changes = collect_changes(version, current) if current != version else None
+            if current != version and changes is None:
+                db.session.close()
+                yield "event: reset\ndata: {}\n\n"
+                return
+            db.session.close()
+            if changes and (changes['todos'] or changes['deleted']):
+                changes['since'] = version
+                version = changes['version']
+                yield f"id: {version}\nevent: changes\ndata: {dumps(changes).decode()}\n\n"
+                last_sent = time.monotonic()
+            elif changes:
+                # Only other lists sharing the change log moved on: catch up, so the next delta starts
+                # here instead of re-reading their changes until our version is pruned from the log
+                version = current
+            woken = commit_counter.wait_for_commit(seen_commits, EVENT_STREAM_POLL_INTERVAL or EVENT_STREAM_HEARTBEAT)
+            if not woken and time.monotonic() - last_sent >= EVENT_STREAM_HEARTBEAT:
+                yield ": keep-alive\n\n" # Comment line, ignored by clients
+                last_sent = time.monotonic()
+
+    return app.response_class(stream_with_context(generate()), mimetype='text/event-stream',
+                              headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 # Add a new todo item
 @app.route('/todos', methods=['POST'])
 def add_todo():
     data = request.json
-    if not data or 'content' not in data or not data['content'].strip():
-        return jsonify({"error": "Content is required"}), 400
-
-    # Get the maximum current position and add 1 for the new todo
-    max_position = db.session.query(db.func.max(Todo.position)).scalar()
-    new_position = (max_position if max_position is not None else -1) + 1
-
-    new_todo = Todo(
-        content=data['content'].strip(),
-        due_date=datetime.datetime.fromisoformat(data['due_date']) if 'due_date' in data and data['due_date'] else None,
-        priority=data.get('priority', 0),
-        position=new_position # Set initial position
-    )
-    db.session.add(new_todo)
+    if not isinstance(data, dict):
+        raise ApiError("Content is required")
+
+    new_todo, = insert_todos([new_todo_fields(data)])
+    prune_change_log()
     db.session.commit()
-    return jsonify(new_todo.to_dict()), 201
+    return todo_response(new_todo, 201)
 
-# Update a todo item
+# Update a todo item; conditional on the todo's version if the request names one (see Row Versions)
 @app.route('/todos/<int:todo_id>', methods=['PUT'])
 def update_todo(todo_id):
-    todo = Todo.query.get_or_404(todo_id)
     data = request.json
-
-    if 'content' in data:
-        todo.content = data['content'].strip()
-    if 'is_completed' in data:
-        todo.is_completed = data['is_completed']
-    if 'due_date' in data:
-        todo.due_date = datetime.datetime.fromisoformat(data['due_date']) if data['due_date'] else None
-    if 'priority' in data:
-        todo.priority = data['priority']
-    if 'position' in data: # Allow updating position directly
-        todo.position = data['position']
-
+    todo = get_todo_or_404(todo_id)
+    update_todo_fields(todo, data, expected_version(data))
+    prune_change_log()
     db.session.commit()
-    return jsonify(todo.to_dict())
+    return todo_response(todo)
 
 # New API endpoint for reordering todos
 @app.route('/todos/reorder', methods=['PUT'])
@@ -97,7 +1613,7 @@ def reorder_todos():
     ordered_ids = data['ordered_ids']
     
     # Fetch all todos that are being reordered to ensure they exist
-    todos_map = {todo.id: todo for todo in Todo.query.filter(Todo.id.in_(ordered_ids)).all()}
+    todos_map = {todo.id: todo for todo in Todo.query.filter(Todo.id.in_(ordered_ids), in_current_list()).all()}
 
     if len(todos_map) != len(ordered_ids):
         # This means some IDs in the list were not found in the database
@@ -106,21 +1622,282 @@ def reorder_todos():
     # Update positions based on the new order
     for index, todo_id in enumerate(ordered_ids):
         todo = todos_map[todo_id]
-        todo.position = index # Assign new position based on list index
+        todo.position = (index + 1) * POSITION_GAP # Assign new gapped position based on list index
+        record_change(todo.id)
+    bump_versions(ordered_ids)
 
+    prune_change_log()
     db.session.commit()
     return jsonify({"message": "Todos reordered successfully."}), 200
 
-# Delete a todo item
+# Move a single todo directly before or after another one
+@app.route('/todos/<int:todo_id>/move', methods=['PUT'])
+def move_todo(todo_id):
+    data = request.json or {}
+    todo = get_todo_or_404(todo_id)
+    move_todo_next_to(todo, data, expected_version(data))
+    prune_change_log()
+    db.session.commit()
+    return todo_response(todo)
+
+# Delete a todo item; send If-Match to only delete it if nobody changed it meanwhile
 @app.route('/todos/<int:todo_id>', methods=['DELETE'])
 def delete_todo(todo_id):
-    todo = Todo.query.get_or_404(todo_id)
-    db.session.delete(todo)
+    todo = get_todo_or_404(todo_id)
+    delete_todo_row(todo, expected_version(None))
+    prune_change_log()
     db.session.commit()
     return '', 204
 
+# Delete all completed todos at once
+@app.route('/todos/completed', methods=['DELETE'])
+def delete_completed():
+    deleted_ids = delete_completed_todos()
+    prune_change_log()
+    db.session.commit()
+    return jsonify({'deleted': deleted_ids})
+
+# Apply a list of create/update/move/delete operations in a single transaction.
+# Either every operation succeeds or none is applied; the failing index is reported.
+@app.route('/todos/batch', methods=['POST'])
+def batch_todos():
+    data = request.json
+    operations = data.get('operations') if isinstance(data, dict) else None
+    if not isinstance(operations, list) or not operations:
+        return jsonify({"error": "Invalid request. 'operations' (non-empty list) is required."}), 400
+    if len(operations) > BATCH_OPERATION_LIMIT:
+        return jsonify({"error": f"At most {BATCH_OPERATION_LIMIT} operations per batch."}), 400
+
+    results = []
+    index = 0
+    try:
+        while index < len(operations):
+            operation = operations[index]
+            op = operation.get('op') if isinstance(operation, dict) else None
+            if op == 'create':
+                # Collect the run of consecutive creates and insert it with one flush
+                fields = []
+                while index < len(operations) and isinstance(operations[index], dict) and operations[index].get('op') == 'create':
+                    fields.append(new_todo_fields(operations[index]))
+                    index += 1
+                results.extend({'status': 201, 'todo': todo.to_dict()} for todo in insert_todos(fields))
+                continue
+            elif op == 'update':
+                todo = get_todo_or_error(operation.get('id'))
+                update_todo_fields(todo, operation, expected_version(operation, use_if_match=False))
+                results.append({'status': 200, 'todo': todo.to_dict()})
+            elif op == 'move':
+                todo = get_todo_or_error(operation.get('id'))
+                move_todo_next_to(todo, operation, expected_version(operation, use_if_match=False))
+                results.append({'status': 200, 'todo': todo.to_dict()})
+            elif op == 'delete':
+                todo = get_todo_or_error(operation.get('id'))
+                delete_todo_row(todo, expected_version(operation, use_if_match=False))
+                results.append({'status': 204, 'id': todo.id})
+            elif op == 'delete_completed':
+                results.append({'status': 200, 'deleted': delete_completed_todos()})
+            else:
+                raise ApiError(f"Unknown op {op!r}, expected one of create, update, move, delete, delete_completed.")
+            index += 1
+    except ApiError as error:
+        db.session.rollback()
+        return jsonify(dict(error.to_dict(), index=index)), error.status
+
+    prune_change_log()
+    db.session.commit()
+    return jsonify({'results': results})
+
+# --- Export / Import ---
+# NDJSON (one todo object per line) in both directions, streamed so neither side holds the whole
+# list in memory. Exported lines carry everything needed to restore the list, in list order.
+
+def todo_export_select():
+    table = Todo.__table__
+    return db.select(
+        table.c.id, table.c.content, table.c.is_completed,
+        db.type_coerce(table.c.created_at, db.String), db.type_coerce(table.c.due_date, db.String),
+        table.c.priority, table.c.position, db.type_coerce(table.c.completed_at, db.String)
+    ).where(in_current_list()).order_by(*TODO_LIST_ORDER)
+
+# Stream every todo of the list as NDJSON. X-Todos-Version is the version the export starts
+# from; changes made while it streams can be fetched from /todos/changes afterwards.
+@app.route('/todos/export', methods=['GET'])
+def export_todos():
+    version = current_version()
+
+    def generate():
+        # One SELECT read in batches: a consistent snapshot with constant memory
+        result = db.session.execute(todo_export_select().execution_options(yield_per=EXPORT_BATCH_SIZE))
+        for rows in result.partitions():
+            yield b''.join(dumps({
+                'id': todo_id,
+                'content': content,
+                'is_completed': is_completed,
+                'created_at': sqlite_isoformat(created_at),
+                'due_date': sqlite_isoformat(due_date),
+                'priority': priority,
+                'position': position,
+                'completed_at': sqlite_isoformat(completed_at)
+            }) + b'\n' for todo_id, content, is_completed, created_at, due_date, priority, position, completed_at in rows)
+        db.session.close()
+
+    return app.response_class(stream_with_context(generate()), mimetype='application/x-ndjson',
+                              headers={'X-Todos-Version': str(version)})
+
+# Column values for one imported line; ids and positions are assigned anew
+def import_todo_row(data):
+    if not isinstance(data, dict):
+        raise ApiError("Expected a JSON object.")
+    fields = new_todo_fields(data)
+    is_completed = bool(data.get('is_completed', False))
+    fields.update(
+        is_completed=is_completed,
+        created_at=parse_datetime_field(data, 'created_at') or datetime.datetime.now(),
+        completed_at=(parse_datetime_field(data, 'completed_at') or datetime.datetime.now()) if is_completed else None
+    )
+    return fields
+
+def parse_datetime_field(data, name):
+    if not data.get(name):
+        return None
+    try:
+        return datetime.datetime.fromisoformat(data[name])
+    except (TypeError, ValueError):
+        raise ApiError(f"Invalid '{name}', expected an ISO 8601 date.")
+
+# Lines of a request body, read in large blocks (iterating the stream itself reads tiny pieces)
+def iter_lines(stream, block_size=65536):
+    pending = b''
+    while True:
+        block = stream.read(block_size)
+        if not block:
+            break
+        lines = (pending + block).split(b'\n')
+        pending = lines.pop()
+        yield from lines
+    if pending:
+        yield pending
+
+# Append one chunk of todos after the list's last position: one MAX(position) lookup and one
+# executemany insert for the whole chunk
+def import_chunk(rows):
+    max_position = db.session.query(db.func.max(Todo.position)).filter(in_current_list()).scalar() or 0
+    list_id = current_list_id()
+    for offset, row in enumerate(rows, 1):
+        row.update(list_id=list_id, position=max_position + offset * POSITION_GAP)
+    table = Todo.__table__
+    # A Core insert: the ORM bulk path falls back to one statement per row when ids are returned
+    todo_ids = db.session.scalars(table.insert().returning(table.c.id), rows).all()
+    record_changes(todo_ids)
+    prune_change_log()
+    db.session.commit()
+
+# Append the todos of an NDJSON request body (e.g. from /todos/export) to the list, in file order.
+# Each chunk of IMPORT_CHUNK_SIZE lines is committed on its own: on an invalid line the chunks
+# before it stay imported, and the response says how many lines that was.
+@app.route('/todos/import', methods=['POST'])
+def import_todos():
+    imported = 0
+    line_number = 0
+    rows = []
+    try:
+        for line in iter_lines(request.stream):
+            line_number += 1
+            if not line.strip():
+                continue
+            try:
+                data = loads(line)
+            except ValueError:
+                raise ApiError("Invalid JSON.")
+            rows.append(import_todo_row(data))
+            if len(rows) == IMPORT_CHUNK_SIZE:
+                import_chunk(rows)
+                imported += len(rows)
+                rows = []
+        if rows:
+            import_chunk(rows)
+            imported += len(rows)
+    except ApiError as error:
+        db.session.rollback()
+        return jsonify({"error": error.message, "line": line_number, "imported": imported}), error.status
+
+    return jsonify({'imported': imported, 'version': current_version()})
+
+# Get all todo lists
+@app.route('/lists', methods=['GET'])
+def get_lists():
+    return jsonify([todo_list.to_dict() for todo_list in TodoList.query.order_by(TodoList.id)])
+
+# Add a new list; with TODO_LIST_SHARD_DIR set it gets its own database file
+@app.route('/lists', methods=['POST'])
+def add_list():
+    data = request.json
+    if not data or not isinstance(data.get('name'), str) or not data['name'].strip():
+        return jsonify({"error": "Name is required"}), 400
+
+    todo_list = TodoList(name=data['name'].strip())
+    db.session.add(todo_list)
+    db.session.flush() # Assign the id, which names the file
+    if LIST_SHARD_DIR:
+        os.makedirs(LIST_SHARD_DIR, exist_ok=True)
+        todo_list.database = os.path.join(os.path.abspath(LIST_SHARD_DIR), f'list-{todo_list.id}.db')
+        list_engine(todo_list.id, todo_list.database) # Create the file and its tables
+    db.session.commit()
+    return jsonify(todo_list.to_dict()), 201
+
+# Rename a list
+@app.route('/lists/<int:list_id>', methods=['PUT'])
+def update_list(list_id):
+    todo_list = TodoList.query.get_or_404(list_id)
+    data = request.json
+    if not data or not isinstance(data.get('name'), str) or not data['name'].strip():
+        return jsonify({"error": "Name is required"}), 400
+
+    todo_list.name = data['name'].strip()
+    db.session.commit()
+    return jsonify(todo_list.to_dict())
+
+# Delete a list with all its todos, change log and archive (the default list can't be deleted)
+@app.route('/lists/<int:list_id>', methods=['DELETE'])
+def delete_list(list_id):
+    todo_list = TodoList.query.get_or_404(list_id)
+    if todo_list.id == DEFAULT_LIST_ID:
+        return jsonify({"error": "The default list cannot be deleted."}), 400
+
+    database = todo_list.database
+    if database is None:
+        # Rows in the main database go in the same transaction as the catalog entry
+        use_todo_list(todo_list.id)
+        for model in (Todo, TodoChange, ArchivedTodo):
+            model.query.filter(in_current_list(model)).delete(synchronize_session=False)
+    db.session.delete(todo_list)
+    db.session.commit()
+    if database is not None:
+        drop_list_storage(list_id, database)
+    return jsonify({"message": "List deleted successfully."}), 200
+
+# Serve with waitress: a production WSGI server with a thread pool that also runs on Windows.
+# For several worker processes on Linux/macOS use gunicorn with wsgi.py instead (see README).
+def run_production(host, port, threads):
+    try:
+        from waitress import serve
+    except ImportError:
+        raise SystemExit("Production mode needs waitress: pip install waitress")
+    # send_bytes=1 flushes every chunk right away, which Server-Sent Events rely on
+    serve(app, host=host, port=port, threads=threads, send_bytes=1)
+
 # Run Flask application
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Minimal Todo API server")
+    parser.add_argument('--production', action='store_true', help="serve with waitress instead of the Flask debug server")
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--threads', type=int, default=16, help="worker threads in production mode (each open event stream holds one)")
+    args = parser.parse_args()
+
     with app.app_context():
-        db.create_all() # Create database tables if they don't exist
-    app.run(debug=True, host='0.0.0.0', port=5000)
+        init_db() # Create database tables and indexes if they don't exist
+    if args.production:
+        run_production(args.host, args.port, args.threads)
+    else:
+        app.run(debug=True, host=args.host, port=args.port)
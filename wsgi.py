@@ -0,0 +1,14 @@
+# wsgi.py
+# Entry point for multi-process WSGI servers, e.g.:
+#   gunicorn --preload --workers 4 --threads 8 --worker-class gthread --bind 0.0.0.0:5000 wsgi:app
+import os
+
+# Each worker only hears about its own commits, so event streams poll for the others' (see README)
+os.environ.setdefault('TODO_EVENT_POLL_INTERVAL', '1')
+
+from server import app, db, init_db
+
+# Create database tables and indexes before serving (once in the master with --preload)
+with app.app_context():
+    init_db()
+    db.engine.dispose() # With --preload, forked workers must not share the master's pooled connections